@@ -1,182 +1,300 @@
 import aiohttp
+import hashlib
+import orjson
+import msgspec
 import asyncio
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from typing import List, Dict, Any, Optional, Union
+from datetime import datetime, timezone
 import logging
-from dataclasses import dataclass
+
+from .http_session import ConcurrencyLimiter, SingleFlight, get_shared_session, retry_delay, MAX_CONCURRENT_REQUESTS, MAX_RETRIES, RETRYABLE_STATUSES
 
 logger = logging.getLogger(__name__)
 
-@dataclass
-class DexScreenerToken:
-    chainId: str
-    dexId: str
-    url: str
-    pairAddress: str
-    baseToken: Dict[str, Any]
-    quoteToken: Dict[str, Any]
-    priceNative: str
-    priceUsd: str
-    txns: Dict[str, Any]
-    volume: Dict[str, Any]
-    priceChange: Dict[str, Any]
-    liquidity: Dict[str, Any]
-    fdv: float
-    marketCap: float
-    pairCreatedAt: datetime
+# Streaming read limits for (potentially large) pair listings
+READ_CHUNK_BYTES = 16384
+MAX_RESPONSE_BYTES = 8 * 1024 * 1024
+
+# Returned by _get_bytes when a conditional GET is answered 304 Not Modified
+NOT_MODIFIED = object()
+
+class DexScreenerToken(msgspec.Struct):
+    """A DexScreener pair, decoded straight from response bytes by msgspec"""
+    chainId: str = ""
+    dexId: str = ""
+    url: str = ""
+    pairAddress: str = ""
+    baseToken: Dict[str, Any] = {}
+    quoteToken: Dict[str, Any] = {}
+    priceNative: str = "0"
+    priceUsd: str = "0"
+    txns: Dict[str, Any] = {}
+    volume: Dict[str, Any] = {}
+    priceChange: Dict[str, Any] = {}
+    liquidity: Dict[str, Any] = {}
+    fdv: Optional[float] = 0.0
+    marketCap: Optional[float] = 0.0
+    # ISO string or epoch milliseconds upstream; always a datetime after decode
+    pairCreatedAt: Union[datetime, int, None] = None
+
+    def __post_init__(self):
+        if self.fdv is None:
+            self.fdv = 0.0
+        if self.marketCap is None:
+            self.marketCap = 0.0
+        if self.pairCreatedAt is None:
+            self.pairCreatedAt = datetime.now(timezone.utc)
+        elif isinstance(self.pairCreatedAt, int):
+            self.pairCreatedAt = datetime.fromtimestamp(self.pairCreatedAt / 1000, tz=timezone.utc)
+
+
+class DexPrice(msgspec.Struct, gc=False):
+    """
+    The fields the price poll reads, as floats. Built once per distinct payload
+    in _fetch_token_price rather than parsed from strings on every poll.
+    """
+    priceUsd: float = 0.0
+    volume_h24: float = 0.0
+    priceChange_h24: float = 0.0
+    marketCap: float = 0.0
+    symbol: str = ""
+
+
+def _to_dex_price(token: Optional[DexScreenerToken]) -> Optional[DexPrice]:
+    """Flatten a pair into a DexPrice; None if there is no pair or its numbers don't parse"""
+    if token is None:
+        return None
+    try:
+        return DexPrice(
+            priceUsd=float(token.priceUsd),
+            volume_h24=float(token.volume.get("h24", 0)),
+            priceChange_h24=float(token.priceChange.get("h24", 0)),
+            marketCap=float(token.marketCap),
+            symbol=token.baseToken.get("symbol", "")
+        )
+    except (TypeError, ValueError) as e:
+        logger.error(f"Error converting pair price data: {e}")
+        return None
+
+
+class DexScreenerPairsResponse(msgspec.Struct):
+    pairs: Optional[List[DexScreenerToken]] = None
+
+
+# Decodes JSON bytes directly into typed structs, no intermediate dicts.
+# strict=False accepts numeric strings for float fields, as float() did.
+_PAIRS_DECODER = msgspec.json.Decoder(DexScreenerPairsResponse, strict=False)
+
 
 class DexScreenerAPI:
-    def __init__(self):
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
         self.base_url = "https://api.dexscreener.com/latest"
-        self.session: Optional[aiohttp.ClientSession] = None
+        # Injected sessions are owned (and closed) by the caller
+        self._injected_session = session
+        self.session: Optional[aiohttp.ClientSession] = session
+        # Caps concurrent outbound requests from this client
+        self._limiter = ConcurrencyLimiter(MAX_CONCURRENT_REQUESTS)
+        # Shares one upstream request among concurrent lookups of the same key
+        self._singleflight = SingleFlight()
+        # Per-token conditional-request state for get_token_price:
+        # last ETag, blake2b digest of the last body, and the token (and its DexPrice) decoded from it
+        self._etags: Dict[str, str] = {}
+        self._body_digests: Dict[str, bytes] = {}
+        self._last_prices: Dict[str, Optional[DexScreenerToken]] = {}
+        self._last_dex_prices: Dict[str, Optional[DexPrice]] = {}
 
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        if self._injected_session is None:
+            # Reuse the pooled session instead of opening one per context
+            self.session = get_shared_session()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        # The session outlives this context; its owner closes it
+        pass
 
-    async def get_token_price(self, token_address: str) -> Optional[DexScreenerToken]:
-        """Get current price and market data for a token"""
+    async def _get_bytes(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        description: str = "request",
+        etag_key: Optional[str] = None
+    ) -> Union[bytes, None, object]:
+        """
+        GET a URL and return the raw body.
+        Bounded by the per-client concurrency limiter and retried with backoff on 429/5xx.
+        With an etag_key the request is conditional on the ETag last seen for
+        that key and returns NOT_MODIFIED on a 304.
+        Returns None if the request ultimately fails.
+        """
         if not self.session:
             raise RuntimeError("DexScreenerAPI must be used as async context manager")
 
-        url = f"{self.base_url}/dex/tokens/{token_address}"
-        
+        headers = None
+        if etag_key is not None and etag_key in self._etags:
+            headers = {"If-None-Match": self._etags[etag_key]}
+
+        for attempt in range(MAX_RETRIES):
+            try:
+                async with self._limiter:
+                    async with self.session.get(url, params=params, headers=headers) as response:
+                        if response.status == 304:
+                            return NOT_MODIFIED
+                        response.raise_for_status()
+                        body = await self._read_body(response)
+                        if etag_key is not None:
+                            etag = response.headers.get("ETag")
+                            if etag:
+                                self._etags[etag_key] = etag
+                            else:
+                                self._etags.pop(etag_key, None)
+                        return body
+            except aiohttp.ClientResponseError as e:
+                if e.status in RETRYABLE_STATUSES and attempt < MAX_RETRIES - 1:
+                    await asyncio.sleep(retry_delay(attempt))
+                    continue
+                logger.error(f"Error {description}: {e}")
+                return None
+            except Exception as e:
+                logger.error(f"Error {description}: {e}")
+                return None
+        return None
+
+    async def _get_json(self, url: str, params: Optional[Dict[str, Any]] = None, description: str = "request") -> Optional[Any]:
+        """GET a URL and decode the JSON body into plain Python objects"""
+        raw = await self._get_bytes(url, params=params, description=description)
+        if not raw:
+            return None
         try:
-            async with self.session.get(url) as response:
-                response.raise_for_status()
-                data = await response.json()
-                
-                if not data.get("pairs"):
-                    return None
-                
-                # Return the first pair (most liquid)
-                pair_data = data["pairs"][0]
-                return self._parse_pair_data(pair_data)
-                
-        except Exception as e:
-            logger.error(f"Error fetching token price for {token_address}: {e}")
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError as e:
+            logger.error(f"Error {description}: {e}")
+            return None
+
+    async def _read_body(self, response: aiohttp.ClientResponse) -> bytes:
+        """
+        Read a response body in chunks, refusing bodies over MAX_RESPONSE_BYTES
+        so a misbehaving upstream cannot balloon memory.
+        """
+        buf = bytearray()
+        async for chunk in response.content.iter_chunked(READ_CHUNK_BYTES):
+            buf.extend(chunk)
+            if len(buf) > MAX_RESPONSE_BYTES:
+                raise ValueError(f"response body exceeds {MAX_RESPONSE_BYTES} bytes")
+        return bytes(buf)
+
+    async def get_token_price(self, token_address: str) -> Optional[DexScreenerToken]:
+        """Get current price and market data for a token"""
+        return await self._singleflight.do(
+            ("token", token_address), lambda: self._fetch_token_price(token_address)
+        )
+
+    async def _fetch_token_price(self, token_address: str) -> Optional[DexScreenerToken]:
+        """
+        Polled repeatedly, so unchanged answers are short-circuited: a 304 or a
+        body that hashes the same as last time returns the previously decoded
+        token object itself, without parsing anything.
+        """
+        url = f"{self.base_url}/dex/tokens/{token_address}"
+        raw = await self._get_bytes(
+            url, description=f"fetching token price for {token_address}", etag_key=token_address
+        )
+        if raw is NOT_MODIFIED:
+            return self._last_prices.get(token_address)
+        if not raw:
             return None
 
+        # Servers that ignore If-None-Match still get the parse skipped for identical bytes
+        digest = hashlib.blake2b(raw, digest_size=8).digest()
+        if self._body_digests.get(token_address) == digest and token_address in self._last_prices:
+            return self._last_prices[token_address]
+
+        pairs = self._decode_pairs(raw)
+        # Return the first pair (most liquid)
+        token = pairs[0] if pairs else None
+        self._body_digests[token_address] = digest
+        self._last_prices[token_address] = token
+        self._last_dex_prices[token_address] = _to_dex_price(token)
+        return token
+
+    async def get_dex_price(self, token_address: str) -> Optional[DexPrice]:
+        """
+        Typed price snapshot for a token, for polling. Same conditional fetch as
+        get_token_price; an unchanged payload returns the same DexPrice object.
+        """
+        token = await self.get_token_price(token_address)
+        if token is None:
+            return None
+        return self._last_dex_prices.get(token_address)
+
+    def forget_token_price(self, token_address: str):
+        """Drop the conditional-request state kept for a token"""
+        self._etags.pop(token_address, None)
+        self._body_digests.pop(token_address, None)
+        self._last_prices.pop(token_address, None)
+        self._last_dex_prices.pop(token_address, None)
+
     async def get_pair_info(self, pair_address: str) -> Optional[DexScreenerToken]:
         """Get detailed information about a trading pair"""
-        if not self.session:
-            raise RuntimeError("DexScreenerAPI must be used as async context manager")
+        return await self._singleflight.do(
+            ("pair", pair_address), lambda: self._fetch_pair_info(pair_address)
+        )
 
+    async def _fetch_pair_info(self, pair_address: str) -> Optional[DexScreenerToken]:
         url = f"{self.base_url}/dex/pairs/{pair_address}"
-        
-        try:
-            async with self.session.get(url) as response:
-                response.raise_for_status()
-                data = await response.json()
-                
-                if not data.get("pairs"):
-                    return None
-                
-                pair_data = data["pairs"][0]
-                return self._parse_pair_data(pair_data)
-                
-        except Exception as e:
-            logger.error(f"Error fetching pair info for {pair_address}: {e}")
-            return None
+        raw = await self._get_bytes(url, description=f"fetching pair info for {pair_address}")
+        pairs = self._decode_pairs(raw)
+        return pairs[0] if pairs else None
 
     async def search_pairs(self, query: str) -> List[DexScreenerToken]:
         """Search for trading pairs by token name or symbol"""
-        if not self.session:
-            raise RuntimeError("DexScreenerAPI must be used as async context manager")
-
         url = f"{self.base_url}/dex/search"
-        params = {"q": query}
-        
-        try:
-            async with self.session.get(url, params=params) as response:
-                response.raise_for_status()
-                data = await response.json()
-                
-                tokens = []
-                for pair_data in data.get("pairs", []):
-                    token = self._parse_pair_data(pair_data)
-                    if token:
-                        tokens.append(token)
-                
-                return tokens
-        except Exception as e:
-            logger.error(f"Error searching pairs: {e}")
-            return []
+        raw = await self._get_bytes(url, params={"q": query}, description="searching pairs")
+        return self._decode_pairs(raw)
 
     async def get_solana_trending(self) -> List[DexScreenerToken]:
         """Get trending tokens on Solana"""
-        if not self.session:
-            raise RuntimeError("DexScreenerAPI must be used as async context manager")
-
         url = f"{self.base_url}/dex/trending/solana"
-        
+        raw = await self._get_bytes(url, description="fetching Solana trending tokens")
+        return self._decode_pairs(raw)
+
+    def _decode_pairs(self, raw: Optional[bytes]) -> List[DexScreenerToken]:
+        """Decode the "pairs" array of a DexScreener response body"""
+        if not raw:
+            return []
+
         try:
-            async with self.session.get(url) as response:
-                response.raise_for_status()
-                data = await response.json()
-                
-                tokens = []
-                for pair_data in data.get("pairs", []):
-                    token = self._parse_pair_data(pair_data)
-                    if token:
-                        tokens.append(token)
-                
-                return tokens
-        except Exception as e:
-            logger.error(f"Error fetching Solana trending tokens: {e}")
+            return _PAIRS_DECODER.decode(raw).pairs or []
+        except msgspec.ValidationError:
+            # One malformed pair shouldn't drop the whole response:
+            # fall back to converting pair by pair and skipping bad entries
+            pass
+        except msgspec.DecodeError as e:
+            logger.error(f"Error decoding pairs response: {e}")
             return []
 
+        data = orjson.loads(raw)
+        tokens = []
+        for pair_data in (data.get("pairs") if isinstance(data, dict) else None) or []:
+            token = self._parse_pair_data(pair_data)
+            if token:
+                tokens.append(token)
+        return tokens
+
     def _parse_pair_data(self, pair_data: Dict[str, Any]) -> Optional[DexScreenerToken]:
         """Parse raw pair data from DexScreener API"""
         try:
-            # Parse timestamps
-            created_str = pair_data.get("pairCreatedAt")
-            if created_str:
-                pair_created_at = datetime.fromisoformat(created_str.replace('Z', '+00:00'))
-            else:
-                pair_created_at = datetime.now()
-
-            return DexScreenerToken(
-                chainId=pair_data.get("chainId", ""),
-                dexId=pair_data.get("dexId", ""),
-                url=pair_data.get("url", ""),
-                pairAddress=pair_data.get("pairAddress", ""),
-                baseToken=pair_data.get("baseToken", {}),
-                quoteToken=pair_data.get("quoteToken", {}),
-                priceNative=pair_data.get("priceNative", "0"),
-                priceUsd=pair_data.get("priceUsd", "0"),
-                txns=pair_data.get("txns", {}),
-                volume=pair_data.get("volume", {}),
-                priceChange=pair_data.get("priceChange", {}),
-                liquidity=pair_data.get("liquidity", {}),
-                fdv=float(pair_data.get("fdv", 0)),
-                marketCap=float(pair_data.get("marketCap", 0)),
-                pairCreatedAt=pair_created_at
-            )
+            return msgspec.convert(pair_data, DexScreenerToken, strict=False)
         except Exception as e:
             logger.error(f"Error parsing pair data: {e}")
             return None
 
     async def get_historical_prices(self, pair_address: str, timeframe: str = "1h") -> List[Dict[str, Any]]:
         """Get historical price data for a pair"""
-        if not self.session:
-            raise RuntimeError("DexScreenerAPI must be used as async context manager")
-
         url = f"{self.base_url}/dex/history"
         params = {
             "pairId": pair_address,
             "interval": timeframe
         }
-        
-        try:
-            async with self.session.get(url, params=params) as response:
-                response.raise_for_status()
-                data = await response.json()
-                return data.get("prices", [])
-        except Exception as e:
-            logger.error(f"Error fetching historical prices: {e}")
-            return []
+        data = await self._get_json(url, params=params, description="fetching historical prices")
+        return data.get("prices", []) if data else []
@@ -0,0 +1,124 @@
+import asyncio
+import random
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+import logging
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Connection pool tuning for upstream APIs (DexScreener, pump.fun)
+POOL_LIMIT = 256
+POOL_LIMIT_PER_HOST = 64
+DNS_CACHE_TTL_SECONDS = 300
+KEEPALIVE_TIMEOUT_SECONDS = 60
+
+# Outbound admission control and retry policy
+MAX_CONCURRENT_REQUESTS = 32
+MAX_RETRIES = 5
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ConcurrencyLimiter:
+    """
+    Caps in-flight requests like a semaphore, but the limit can be changed at
+    runtime (e.g. narrowed while an upstream is rate limiting us) without
+    touching asyncio.Semaphore internals.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self._active = 0
+        self._cmax = max_concurrency
+        self._cond = asyncio.Condition()
+
+    @property
+    def max_concurrency(self) -> int:
+        return self._cmax
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._active < self._cmax)
+            self._active += 1
+
+    async def release(self):
+        async with self._cond:
+            self._active -= 1
+            self._cond.notify(1)
+
+    async def resize(self, max_concurrency: int):
+        """Change the limit; waiters are woken so a wider limit applies immediately"""
+        self._cmax = max(1, max_concurrency)
+        async with self._cond:
+            self._cond.notify_all()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.release()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one upstream request.
+    Followers await the leader's in-flight task; a caller being cancelled
+    does not cancel the shared request for everyone else.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _task: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+
+_shared_session: Optional[aiohttp.ClientSession] = None
+_shared_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_shared_session() -> aiohttp.ClientSession:
+    """
+    Get the process-wide aiohttp session for upstream API calls.
+    Created lazily once per event loop so keep-alive connections are reused
+    across API clients instead of paying a TCP+TLS handshake per call.
+    """
+    global _shared_session, _shared_loop
+
+    loop = asyncio.get_running_loop()
+    if _shared_session is None or _shared_session.closed or _shared_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=POOL_LIMIT,
+            limit_per_host=POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=DNS_CACHE_TTL_SECONDS,
+            keepalive_timeout=KEEPALIVE_TIMEOUT_SECONDS
+        )
+        _shared_session = aiohttp.ClientSession(connector=connector)
+        _shared_loop = loop
+        logger.info("Created shared upstream HTTP session")
+
+    return _shared_session
+
+
+async def close_shared_session():
+    """Close the shared session (called from application shutdown)"""
+    global _shared_session, _shared_loop
+
+    if _shared_session and not _shared_session.closed:
+        await _shared_session.close()
+    _shared_session = None
+    _shared_loop = None
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter for the given (0-based) retry attempt"""
+    return 2 ** attempt * 0.25 + random.random() * 0.1
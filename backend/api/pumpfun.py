@@ -1,159 +1,153 @@
 import aiohttp
+import orjson
+import msgspec
 import asyncio
 from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import logging
-from dataclasses import dataclass
+
+from .http_session import ConcurrencyLimiter, SingleFlight, get_shared_session, retry_delay, MAX_CONCURRENT_REQUESTS, MAX_RETRIES, RETRYABLE_STATUSES
 
 logger = logging.getLogger(__name__)
 
-@dataclass
-class PumpFunToken:
-    name: str
-    symbol: str
-    mint: str
-    bonding_curve_key: str
-    associated_bonding_curve: str
-    token_uri: str
-    image_uri: str
-    metadata: Dict[str, Any]
-    created: datetime
-    market_cap: float
-    current_price: float
-    virtual_token_reserves: float
-    virtual_sol_reserves: float
+class PumpFunToken(msgspec.Struct):
+    """A pump.fun token, decoded straight from response bytes by msgspec"""
+    name: str = ""
+    symbol: str = ""
+    mint: str = ""
+    bonding_curve_key: str = ""
+    associated_bonding_curve: str = ""
+    token_uri: str = ""
+    image_uri: str = ""
+    metadata: Dict[str, Any] = {}
+    created: Optional[datetime] = None
+    market_cap: float = msgspec.field(default=0.0, name="usd_market_cap")
+    current_price: float = msgspec.field(default=0.0, name="price")
+    virtual_token_reserves: float = 0.0
+    virtual_sol_reserves: float = 0.0
+
+    def __post_init__(self):
+        if self.created is None:
+            self.created = datetime.now(timezone.utc)
+
+
+# Decode JSON bytes directly into typed structs, no intermediate dicts.
+# strict=False accepts numeric strings for float fields, as float() did.
+_TOKEN_DECODER = msgspec.json.Decoder(PumpFunToken, strict=False)
+_TOKEN_LIST_DECODER = msgspec.json.Decoder(List[PumpFunToken], strict=False)
 
 class PumpFunAPI:
-    def __init__(self):
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
         self.base_url = "https://frontend-api.pump.fun"
-        self.session: Optional[aiohttp.ClientSession] = None
+        # Injected sessions are owned (and closed) by the caller
+        self._injected_session = session
+        self.session: Optional[aiohttp.ClientSession] = session
+        # Caps concurrent outbound requests from this client
+        self._limiter = ConcurrencyLimiter(MAX_CONCURRENT_REQUESTS)
+        # Shares one upstream request among concurrent lookups of the same key
+        self._singleflight = SingleFlight()
 
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        if self._injected_session is None:
+            # Reuse the pooled session instead of opening one per context
+            self.session = get_shared_session()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        # The session outlives this context; its owner closes it
+        pass
 
-    async def get_recent_tokens(self, limit: int = 50) -> List[PumpFunToken]:
-        """Get recently created tokens from pump.fun"""
+    async def _get_bytes(self, url: str, params: Optional[Dict[str, Any]] = None, description: str = "request") -> Optional[bytes]:
+        """
+        GET a URL and return the raw body.
+        Bounded by the per-client concurrency limiter and retried with backoff on 429/5xx.
+        Returns None if the resource does not exist or the request ultimately fails.
+        """
         if not self.session:
             raise RuntimeError("PumpFunAPI must be used as async context manager")
 
+        for attempt in range(MAX_RETRIES):
+            try:
+                async with self._limiter:
+                    async with self.session.get(url, params=params) as response:
+                        if response.status == 404:
+                            return None
+                        response.raise_for_status()
+                        return await response.read()
+            except aiohttp.ClientResponseError as e:
+                if e.status in RETRYABLE_STATUSES and attempt < MAX_RETRIES - 1:
+                    await asyncio.sleep(retry_delay(attempt))
+                    continue
+                logger.error(f"Error {description}: {e}")
+                return None
+            except Exception as e:
+                logger.error(f"Error {description}: {e}")
+                return None
+        return None
+
+    async def get_recent_tokens(self, limit: int = 50) -> List[PumpFunToken]:
+        """Get recently created tokens from pump.fun"""
         url = f"{self.base_url}/coins/recent"
-        params = {"limit": limit}
-        
-        try:
-            async with self.session.get(url, params=params) as response:
-                response.raise_for_status()
-                data = await response.json()
-                
-                tokens = []
-                for token_data in data:
-                    token = self._parse_token_data(token_data)
-                    if token:
-                        tokens.append(token)
-                
-                return tokens
-        except Exception as e:
-            logger.error(f"Error fetching recent tokens: {e}")
-            return []
+        raw = await self._get_bytes(url, params={"limit": limit}, description="fetching recent tokens")
+        return self._decode_tokens(raw)
 
     async def get_token_info(self, mint_address: str) -> Optional[PumpFunToken]:
         """Get detailed information about a specific token"""
-        if not self.session:
-            raise RuntimeError("PumpFunAPI must be used as async context manager")
+        return await self._singleflight.do(
+            ("token", mint_address), lambda: self._fetch_token_info(mint_address)
+        )
 
+    async def _fetch_token_info(self, mint_address: str) -> Optional[PumpFunToken]:
         url = f"{self.base_url}/coin/{mint_address}"
-        
+        raw = await self._get_bytes(url, description=f"fetching token info for {mint_address}")
+        if not raw:
+            return None
+
         try:
-            async with self.session.get(url) as response:
-                if response.status == 404:
-                    return None
-                response.raise_for_status()
-                data = await response.json()
-                return self._parse_token_data(data)
-        except Exception as e:
-            logger.error(f"Error fetching token info for {mint_address}: {e}")
+            return _TOKEN_DECODER.decode(raw)
+        except msgspec.MsgspecError as e:
+            logger.error(f"Error parsing token data: {e}")
             return None
 
     async def get_featured_tokens(self) -> List[PumpFunToken]:
         """Get featured/trending tokens from pump.fun"""
-        if not self.session:
-            raise RuntimeError("PumpFunAPI must be used as async context manager")
-
         url = f"{self.base_url}/coins/featured"
-        
+        raw = await self._get_bytes(url, description="fetching featured tokens")
+        return self._decode_tokens(raw)
+
+    def _decode_tokens(self, raw: Optional[bytes]) -> List[PumpFunToken]:
+        """Decode a pump.fun token list response body"""
+        if not raw:
+            return []
+
         try:
-            async with self.session.get(url) as response:
-                response.raise_for_status()
-                data = await response.json()
-                
-                tokens = []
-                for token_data in data:
-                    token = self._parse_token_data(token_data)
-                    if token:
-                        tokens.append(token)
-                
-                return tokens
-        except Exception as e:
-            logger.error(f"Error fetching featured tokens: {e}")
+            return _TOKEN_LIST_DECODER.decode(raw)
+        except msgspec.ValidationError:
+            # One malformed token shouldn't drop the whole response:
+            # fall back to converting token by token and skipping bad entries
+            pass
+        except msgspec.DecodeError as e:
+            logger.error(f"Error decoding token list response: {e}")
             return []
 
+        data = orjson.loads(raw)
+        tokens = []
+        for token_data in data if isinstance(data, list) else []:
+            token = self._parse_token_data(token_data)
+            if token:
+                tokens.append(token)
+        return tokens
+
     def _parse_token_data(self, token_data: Dict[str, Any]) -> Optional[PumpFunToken]:
         """Parse raw token data from pump.fun API"""
         try:
-            # Extract market cap and price data
-            market_cap = float(token_data.get("usd_market_cap", 0))
-            current_price = float(token_data.get("price", 0))
-            
-            # Parse timestamps
-            created_str = token_data.get("created")
-            if created_str:
-                created = datetime.fromisoformat(created_str.replace('Z', '+00:00'))
-            else:
-                created = datetime.now()
-
-            return PumpFunToken(
-                name=token_data.get("name", ""),
-                symbol=token_data.get("symbol", ""),
-                mint=token_data.get("mint", ""),
-                bonding_curve_key=token_data.get("bonding_curve_key", ""),
-                associated_bonding_curve=token_data.get("associated_bonding_curve", ""),
-                token_uri=token_data.get("token_uri", ""),
-                image_uri=token_data.get("image_uri", ""),
-                metadata=token_data.get("metadata", {}),
-                created=created,
-                market_cap=market_cap,
-                current_price=current_price,
-                virtual_token_reserves=float(token_data.get("virtual_token_reserves", 0)),
-                virtual_sol_reserves=float(token_data.get("virtual_sol_reserves", 0))
-            )
+            return msgspec.convert(token_data, PumpFunToken, strict=False)
         except Exception as e:
             logger.error(f"Error parsing token data: {e}")
             return None
 
     async def search_tokens(self, query: str) -> List[PumpFunToken]:
         """Search for tokens by name or symbol"""
-        if not self.session:
-            raise RuntimeError("PumpFunAPI must be used as async context manager")
-
         url = f"{self.base_url}/search"
-        params = {"q": query}
-        
-        try:
-            async with self.session.get(url, params=params) as response:
-                response.raise_for_status()
-                data = await response.json()
-                
-                tokens = []
-                for token_data in data:
-                    token = self._parse_token_data(token_data)
-                    if token:
-                        tokens.append(token)
-                
-                return tokens
-        except Exception as e:
-            logger.error(f"Error searching tokens: {e}")
-            return []
+        raw = await self._get_bytes(url, params={"q": query}, description="searching tokens")
+        return self._decode_tokens(raw)
@@ -1,307 +1,476 @@
-import redis
-import json
+import redis.asyncio as aioredis
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+import orjson
+import msgpack
+import zstandard
 import asyncio
-from typing import List, Dict, Any, Optional, Union
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import logging
 from dataclasses import asdict
 import pickle
 
-from ..main import Market, RealMarket, PriceUpdate
+from main import Market, PriceUpdate
 
 logger = logging.getLogger(__name__)
 
+# Key prefixes as bytes: the client runs with decode_responses=False and
+# accepts bytes keys, so per-id keys are a single concatenation
+_K_MARKET = b"market:"
+_K_PRICE = b"price_update:"
+WS_CONNECTIONS_KEY = "websocket_connections"
+
+# Values above this size are zstd-compressed before being written.
+# Every value gets a 1-byte tag so readers know how to decode it.
+COMPRESS_THRESHOLD_BYTES = 1024
+_TAG_RAW = b"\x00"
+_TAG_ZSTD = b"\x01"
+
+# Batches at least this large are serialized in a worker thread
+OFFLOAD_BATCH_SIZE = 50
+
+_ZC = zstandard.ZstdCompressor(level=3)
+_ZD = zstandard.ZstdDecompressor()
+
+
+def _compress(data: bytes) -> bytes:
+    """Tag a payload, zstd-compressing it if it is large"""
+    if len(data) > COMPRESS_THRESHOLD_BYTES:
+        return _TAG_ZSTD + _ZC.compress(data)
+    return _TAG_RAW + data
+
+
+def _decompress(data: bytes) -> bytes:
+    """Reverse _compress"""
+    if data[:1] == _TAG_ZSTD:
+        return _ZD.decompress(data[1:])
+    return data[1:]
+
+
+def _encode_market(market: Market) -> bytes:
+    """Serialize a market for Redis (msgpack: compact, no repeated JSON quoting)"""
+    return msgpack.packb(market.model_dump(), use_bin_type=True, default=str)
+
+
+def _encode_markets(markets: List[Market]) -> List[Tuple[bytes, bytes]]:
+    """Build (key, payload) pairs for a batch of markets"""
+    return [(_K_MARKET + market.id.encode(), _encode_market(market)) for market in markets]
+
+
+def _decode_market(data: bytes) -> Market:
+    """Deserialize a market written by _encode_market"""
+    return Market(**msgpack.unpackb(data, raw=False))
+
+
+class _LocalTTLCache:
+    """
+    Tiny in-process LRU with a per-entry TTL, used in front of Redis so hot
+    keys are served without a network round-trip.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at >= self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
 class CacheManager:
     def __init__(self, redis_url: str = "redis://localhost:6379"):
         self.redis_url = redis_url
-        self.redis_client: Optional[redis.Redis] = None
+        self.redis_client: Optional[aioredis.Redis] = None
         self.default_ttl = 300  # 5 minutes
         self.market_ttl = 60   # 1 minute for market data
         self.price_ttl = 30    # 30 seconds for price data
+        # Connection state tracked locally so cache ops don't PING first
+        self._available: bool = False
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self.reconnect_delay = 5  # seconds between reconnect attempts
+        # In-process L1 in front of Redis ("stale is fine" within a few seconds)
+        self._l1_markets = _LocalTTLCache(max_size=1024, ttl=5.0)
+        self._l1_prices = _LocalTTLCache(max_size=1024, ttl=1.0)
 
     async def connect(self):
         """Initialize Redis connection"""
         try:
-            self.redis_client = redis.from_url(
+            self.redis_client = aioredis.from_url(
                 self.redis_url,
                 decode_responses=False,  # Handle binary data
                 socket_timeout=5,
                 socket_connect_timeout=5,
-                retry_on_timeout=True
+                retry_on_timeout=True,
+                max_connections=64
             )
             # Test connection
             await self.redis_client.ping()
+            self._available = True
             logger.info("Redis cache connected successfully")
         except Exception as e:
             logger.error(f"Failed to connect to Redis: {e}")
             self.redis_client = None
+            self._available = False
 
     async def disconnect(self):
         """Close Redis connection"""
+        self._available = False
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
         if self.redis_client:
-            await self.redis_client.close()
+            await self.redis_client.aclose()
 
     async def is_available(self) -> bool:
-        """Check if Redis is available"""
+        """Health check: actually PINGs Redis (cache ops use the cached flag instead)"""
         if not self.redis_client:
             return False
         try:
             await self.redis_client.ping()
+            self._available = True
             return True
         except:
+            self._available = False
             return False
 
+    def _handle_error(self, error: Exception):
+        """Mark the cache unavailable on connection failures and retry in the background"""
+        if not isinstance(error, (RedisConnectionError, RedisTimeoutError)):
+            return
+        self._available = False
+        if self.redis_client and (self._reconnect_task is None or self._reconnect_task.done()):
+            self._reconnect_task = asyncio.create_task(self._reconnect_soon())
+
+    async def _reconnect_soon(self):
+        """Re-check Redis until it answers again"""
+        while self.redis_client and not self._available:
+            await asyncio.sleep(self.reconnect_delay)
+            if await self.is_available():
+                logger.info("Redis cache connection restored")
+
     # Market Caching
-    async def cache_market(self, market: Union[Market, RealMarket], ttl: Optional[int] = None):
+    async def cache_market(self, market: Market, ttl: Optional[int] = None):
         """Cache a single market"""
-        if not await self.is_available():
+        if not self._available:
             return
 
         try:
-            key = f"market:{market.id}"
-            data = json.dumps(market.dict(), default=str)
+            key = _K_MARKET + market.id.encode()
+            data = _encode_market(market)
             await self.redis_client.setex(
                 key, 
                 ttl or self.market_ttl, 
                 data
             )
+            self._l1_markets.set(market.id, market)
         except Exception as e:
+            self._handle_error(e)
             logger.error(f"Error caching market {market.id}: {e}")
 
-    async def cache_markets(self, markets: List[Union[Market, RealMarket]], ttl: Optional[int] = None):
+    async def cache_markets(self, markets: List[Market], ttl: Optional[int] = None):
         """Cache multiple markets using pipeline"""
-        if not await self.is_available():
+        if not self._available:
             return
 
         try:
-            pipe = self.redis_client.pipeline()
+            # Serialize big batches off the event loop; small ones aren't worth a thread hop
+            if len(markets) >= OFFLOAD_BATCH_SIZE:
+                payloads = await asyncio.to_thread(_encode_markets, markets)
+            else:
+                payloads = _encode_markets(markets)
+
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, data in payloads:
+                    pipe.setex(key, ttl or self.market_ttl, data)
+                
+                await pipe.execute()
             for market in markets:
-                key = f"market:{market.id}"
-                data = json.dumps(market.dict(), default=str)
-                pipe.setex(key, ttl or self.market_ttl, data)
-            
-            await pipe.execute()
+                self._l1_markets.pop(market.id)
             logger.info(f"Cached {len(markets)} markets")
         except Exception as e:
+            self._handle_error(e)
             logger.error(f"Error caching markets: {e}")
 
-    async def get_market(self, market_id: str) -> Optional[Union[Market, RealMarket]]:
-        """Get a single market from cache"""
-        if not await self.is_available():
+    async def get_market(self, market_id: str) -> Optional[Market]:
+        """Get a single market from cache (in-process L1 first, then Redis)"""
+        market = self._l1_markets.get(market_id)
+        if market is not None:
+            return market
+
+        if not self._available:
             return None
 
         try:
-            key = f"market:{market_id}"
+            key = _K_MARKET + market_id.encode()
             data = await self.redis_client.get(key)
             if data:
-                market_dict = json.loads(data)
-                # Determine if it's a RealMarket or Market based on fields
-                if "volume_24h" in market_dict:
-                    return RealMarket(**market_dict)
-                else:
-                    return Market(**market_dict)
+                market = _decode_market(data)
+                self._l1_markets.set(market_id, market)
+                return market
         except Exception as e:
+            self._handle_error(e)
             logger.error(f"Error getting market {market_id}: {e}")
         return None
 
-    async def get_markets(self, market_ids: List[str]) -> List[Union[Market, RealMarket]]:
-        """Get multiple markets from cache using pipeline"""
-        if not await self.is_available():
+    async def get_markets(self, market_ids: List[str]) -> List[Market]:
+        """Get multiple markets from cache with a single MGET"""
+        if not self._available or not market_ids:
             return []
 
         try:
-            pipe = self.redis_client.pipeline()
-            keys = [f"market:{mid}" for mid in market_ids]
-            pipe.mget(keys)
-            results = await pipe.execute()
-            
-            markets = []
-            for data in results:
-                if data:
-                    market_dict = json.loads(data)
-                    if "volume_24h" in market_dict:
-                        markets.append(RealMarket(**market_dict))
-                    else:
-                        markets.append(Market(**market_dict))
+            results = await self.redis_client.mget([_K_MARKET + mid.encode() for mid in market_ids])
             
-            return markets
+            return [_decode_market(data) for data in results if data]
         except Exception as e:
+            self._handle_error(e)
             logger.error(f"Error getting markets: {e}")
             return []
 
     async def delete_market(self, market_id: str):
         """Delete a market from cache"""
-        if not await self.is_available():
+        self._l1_markets.pop(market_id)
+        if not self._available:
             return
 
         try:
-            key = f"market:{market_id}"
+            key = _K_MARKET + market_id.encode()
             await self.redis_client.delete(key)
         except Exception as e:
+            self._handle_error(e)
             logger.error(f"Error deleting market {market_id}: {e}")
 
     # Price Update Caching
-    async def cache_price_update(self, price_update: PriceUpdate, ttl: Optional[int] = None):
-        """Cache a price update"""
-        if not await self.is_available():
+    async def cache_price_update(self, price_update: PriceUpdate, ttl: Optional[int] = None, serialized: Optional[bytes] = None):
+        """
+        Cache a price update.
+        Callers that already hold the JSON encoding of price_update.model_dump()
+        can pass it as `serialized` to skip encoding it again.
+        """
+        if not self._available:
             return
 
         try:
-            key = f"price_update:{price_update.market_id}"
-            data = json.dumps(price_update.dict(), default=str)
+            key = _K_PRICE + price_update.market_id.encode()
+            data = serialized if serialized is not None else orjson.dumps(price_update.model_dump(), default=str)
             await self.redis_client.setex(
                 key, 
                 ttl or self.price_ttl, 
                 data
             )
+            self._l1_prices.set(price_update.market_id, price_update)
         except Exception as e:
+            self._handle_error(e)
             logger.error(f"Error caching price update: {e}")
 
     async def get_price_update(self, market_id: str) -> Optional[PriceUpdate]:
-        """Get a price update from cache"""
-        if not await self.is_available():
+        """Get a price update from cache (in-process L1 first, then Redis)"""
+        price_update = self._l1_prices.get(market_id)
+        if price_update is not None:
+            return price_update
+
+        if not self._available:
             return None
 
         try:
-            key = f"price_update:{market_id}"
+            key = _K_PRICE + market_id.encode()
             data = await self.redis_client.get(key)
             if data:
-                price_dict = json.loads(data)
-                return PriceUpdate(**price_dict)
+                price_update = PriceUpdate(**orjson.loads(data))
+                self._l1_prices.set(market_id, price_update)
+                return price_update
         except Exception as e:
+            self._handle_error(e)
             logger.error(f"Error getting price update: {e}")
         return None
 
     # Market List Caching (for pagination)
     async def cache_market_list(self, market_type: str, markets: List[str], ttl: Optional[int] = None):
         """Cache a list of market IDs by type"""
-        if not await self.is_available():
+        if not self._available:
             return
 
         try:
             key = f"market_list:{market_type}"
-            data = json.dumps(markets)
+            data = _compress(orjson.dumps(markets))
             await self.redis_client.setex(
                 key, 
                 ttl or self.default_ttl, 
                 data
             )
         except Exception as e:
+            self._handle_error(e)
             logger.error(f"Error caching market list: {e}")
 
     async def get_market_list(self, market_type: str) -> List[str]:
         """Get a list of market IDs by type"""
-        if not await self.is_available():
+        if not self._available:
             return []
 
         try:
             key = f"market_list:{market_type}"
             data = await self.redis_client.get(key)
             if data:
-                return json.loads(data)
+                return orjson.loads(_decompress(data))
         except Exception as e:
+            self._handle_error(e)
             logger.error(f"Error getting market list: {e}")
         return []
 
     # Pagination Support
     async def cache_paginated_markets(self, cache_key: str, markets: List[Dict], total_count: int, ttl: Optional[int] = None):
         """Cache paginated market results"""
-        if not await self.is_available():
+        if not self._available:
             return
 
         try:
             data = {
                 "markets": markets,
                 "total_count": total_count,
-                "cached_at": datetime.now().isoformat()
+                "cached_at": datetime.now()
             }
             await self.redis_client.setex(
                 cache_key, 
                 ttl or self.default_ttl, 
-                json.dumps(data, default=str)
+                _compress(orjson.dumps(data, default=str))
             )
         except Exception as e:
+            self._handle_error(e)
             logger.error(f"Error caching paginated markets: {e}")
 
     async def get_paginated_markets(self, cache_key: str) -> Optional[Dict]:
         """Get cached paginated market results"""
-        if not await self.is_available():
+        if not self._available:
             return None
 
         try:
             data = await self.redis_client.get(cache_key)
             if data:
-                return json.loads(data)
+                return orjson.loads(_decompress(data))
         except Exception as e:
+            self._handle_error(e)
             logger.error(f"Error getting paginated markets: {e}")
         return None
 
     # WebSocket Connection Caching
     async def cache_websocket_connections(self, connection_count: int, ttl: Optional[int] = None):
         """Cache WebSocket connection count for monitoring"""
-        if not await self.is_available():
+        if not self._available:
             return
 
         try:
-            key = "websocket_connections"
+            key = WS_CONNECTIONS_KEY
             await self.redis_client.setex(
                 key, 
                 ttl or 60,  # 1 minute
                 connection_count
             )
         except Exception as e:
+            self._handle_error(e)
             logger.error(f"Error caching WebSocket connections: {e}")
 
+    async def ws_connect(self, ttl: Optional[int] = None):
+        """Atomically count a new WebSocket connection (safe across workers)"""
+        await self._adjust_websocket_connections(1, ttl)
+
+    async def ws_disconnect(self, ttl: Optional[int] = None):
+        """Atomically count a closed WebSocket connection"""
+        await self._adjust_websocket_connections(-1, ttl)
+
+    async def _adjust_websocket_connections(self, delta: int, ttl: Optional[int]):
+        if not self._available:
+            return
+
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.incrby(WS_CONNECTIONS_KEY, delta)
+                pipe.expire(WS_CONNECTIONS_KEY, ttl or 60)  # 1 minute
+                await pipe.execute()
+        except Exception as e:
+            self._handle_error(e)
+            logger.error(f"Error updating WebSocket connection count: {e}")
+
     async def get_websocket_connections(self) -> int:
         """Get cached WebSocket connection count"""
-        if not await self.is_available():
+        if not self._available:
             return 0
 
         try:
-            key = "websocket_connections"
-            count = await self.redis_client.get(key)
-            return int(count) if count else 0
+            count = await self.redis_client.get(WS_CONNECTIONS_KEY)
+            # A counter that expired mid-session can dip below zero
+            return max(0, int(count or 0))
         except Exception as e:
+            self._handle_error(e)
             logger.error(f"Error getting WebSocket connections: {e}")
             return 0
 
     # Cache Invalidation
     async def invalidate_market_cache(self, market_id: str):
         """Invalidate all cache entries for a specific market"""
-        if not await self.is_available():
+        self._l1_markets.pop(market_id)
+        self._l1_prices.pop(market_id)
+        if not self._available:
             return
 
         try:
-            pipe = self.redis_client.pipeline()
-            pipe.delete(f"market:{market_id}")
-            pipe.delete(f"price_update:{market_id}")
-            await pipe.execute()
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.delete(_K_MARKET + market_id.encode())
+                pipe.delete(_K_PRICE + market_id.encode())
+                await pipe.execute()
         except Exception as e:
+            self._handle_error(e)
             logger.error(f"Error invalidating market cache: {e}")
 
+    async def _unlink_matching(self, pattern: str, batch_size: int = 500):
+        """
+        Remove all keys matching a pattern.
+        Uses cursor-based SCAN (never blocks Redis like KEYS) and UNLINK so
+        the memory is reclaimed in the background.
+        """
+        batch = []
+        async for key in self.redis_client.scan_iter(match=pattern, count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                await self.redis_client.unlink(*batch)
+                batch.clear()
+        if batch:
+            await self.redis_client.unlink(*batch)
+
     async def invalidate_all_markets(self):
         """Invalidate all market-related cache entries"""
-        if not await self.is_available():
+        self._l1_markets.clear()
+        self._l1_prices.clear()
+        if not self._available:
             return
 
         try:
-            pattern = "market:*"
-            keys = await self.redis_client.keys(pattern)
-            if keys:
-                await self.redis_client.delete(*keys)
-            
-            pattern = "price_update:*"
-            keys = await self.redis_client.keys(pattern)
-            if keys:
-                await self.redis_client.delete(*keys)
-            
-            pattern = "market_list:*"
-            keys = await self.redis_client.keys(pattern)
-            if keys:
-                await self.redis_client.delete(*keys)
+            for pattern in ("market:*", "price_update:*", "market_list:*", "pm:*"):
+                await self._unlink_matching(pattern)
                 
             logger.info("Invalidated all market cache entries")
         except Exception as e:
+            self._handle_error(e)
             logger.error(f"Error invalidating all markets: {e}")
 
     # Cache Statistics
@@ -1,21 +1,28 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional, Dict
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel, PrivateAttr
+import msgspec
+import numpy as np
+from typing import List, Optional, Dict, Set, Tuple, Deque
 from enum import Enum
-import json
+import orjson
 import asyncio
-import random
 import logging
 import os
+import time
 from datetime import datetime, timedelta
 import uuid
-from collections import defaultdict
+from collections import defaultdict, deque
+from itertools import islice
+from functools import lru_cache
+from sortedcontainers import SortedDict
 
 # Import SOL price oracle for live price fetching
 from services.sol_price_oracle import sol_price_oracle, SolPriceData
+from api.http_session import close_shared_session
 
-app = FastAPI(title="MemeMarket API - Polymarket Style CLOB")
+app = FastAPI(title="MemeMarket API - Polymarket Style CLOB", default_response_class=ORJSONResponse)
 
 # Price precision: 1_000_000 = $1.00
 PRICE_PRECISION = 1_000_000
@@ -23,6 +30,9 @@ PRICE_PRECISION = 1_000_000
 # 1 SOL = 1,000,000,000 lamports
 LAMPORTS_PER_SOL = 1_000_000_000
 
+# Trade history retention per market (oldest trades are evicted beyond this)
+MAX_TRADES_PER_MARKET = 10_000
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -72,13 +82,22 @@ class Market(BaseModel):
     winning_outcome: Optional[str] = None
     created_at: str
     last_updated: str
+    # Lowercased "symbol\x00question" for search; neither field changes after creation
+    _search_blob: str = PrivateAttr(default="")
+
+    def model_post_init(self, __context):
+        self._search_blob = f"{self.token_symbol.lower()}\x00{self.question.lower()}"
 
-class Order(BaseModel):
+# Orders and trades live in the matching engine and are mutated on every fill,
+# so they are plain msgspec structs rather than validated pydantic models.
+# Request/response models stay pydantic; endpoints convert with to_builtins.
+class Order(msgspec.Struct, gc=False, eq=False):
     id: str
     market_id: str
     owner: str  # Wallet address
     side: OrderSide
     price: float  # Price in dollars (0.00 - 1.00)
+    price_tick: int  # Price in cents (1 - 99), used internally for exact matching
     quantity: int  # Number of shares
     filled_quantity: int
     remaining_quantity: int
@@ -113,7 +132,7 @@ class PlaceOrderRequest(BaseModel):
     quantity: int  # Number of shares
     is_sell: bool = False
 
-class TradeExecuted(BaseModel):
+class TradeExecuted(msgspec.Struct, gc=False):
     id: str
     market_id: str
     yes_order_id: str
@@ -142,10 +161,118 @@ class PriceUpdate(BaseModel):
 
 # Storage for markets, orders, and shares
 active_markets: Dict[str, Market] = {}
-order_books: Dict[str, Dict[str, List[Order]]] = {}  # market_id -> {"yes_bids": [], "yes_asks": [], "no_bids": [], "no_asks": []}
+# market_id -> {"yes_bids": SortedDict[tick -> deque[Order]], "yes_asks": ..., "no_bids": ..., "no_asks": ...}
+# Each price level is a FIFO queue of live (open / partially filled) orders.
+order_books: Dict[str, Dict[str, SortedDict]] = {}
+# Same shape, but tick -> PriceLevelAgg; kept in step with order_books on every add/fill/cancel
+book_aggregates: Dict[str, Dict[str, SortedDict]] = {}
 all_orders: Dict[str, Order] = {}  # order_id -> Order
-user_shares: Dict[str, Dict[str, UserShares]] = {}  # wallet -> market_id -> UserShares
-trades: List[TradeExecuted] = []
+orders_by_owner: Dict[str, List[Order]] = defaultdict(list)  # wallet -> orders, oldest first
+user_shares: Dict[Tuple[str, str], UserShares] = {}  # (wallet, market_id) -> UserShares
+# market_id -> recent trades, oldest first
+trades_by_market: Dict[str, Deque[TradeExecuted]] = defaultdict(lambda: deque(maxlen=MAX_TRADES_PER_MARKET))
+subscribers: Dict[str, Set[WebSocket]] = defaultdict(set)  # market_id -> sockets subscribed to price updates
+market_locks: Dict[str, asyncio.Lock] = {}  # market_id -> lock serializing book mutation + matching
+# Serialized GET /markets body; dropped whenever a market is created or trades
+_markets_snapshot: Optional[bytes] = None
+# Bumped on every market mutation; lets derived views (e.g. paginator orderings) key their caches
+markets_version = 0
+
+# ISO timestamp reused for everything stamped within the same millisecond
+_NOW_CACHE = {"ts": 0.0, "iso": ""}
+
+
+def now_iso() -> str:
+    """datetime.now().isoformat(), memoized for 1ms so a burst of fills shares one string"""
+    t = time.monotonic()
+    if t - _NOW_CACHE["ts"] > 0.001:
+        _NOW_CACHE.update(ts=t, iso=datetime.now().isoformat())
+    return _NOW_CACHE["iso"]
+
+
+def _markets_changed():
+    """Drop the /markets snapshot and bump markets_version after any market mutation"""
+    global _markets_snapshot, markets_version
+    _markets_snapshot = None
+    markets_version += 1
+
+
+def _market_lock(market_id: str) -> asyncio.Lock:
+    """Per-market lock, so mutations of one book never wait on another market"""
+    lock = market_locks.get(market_id)
+    if lock is None:
+        lock = market_locks[market_id] = asyncio.Lock()
+    return lock
+
+
+def _record_order(order: Order):
+    """Register a new order in the global and per-wallet indexes"""
+    all_orders[order.id] = order
+    orders_by_owner[order.owner].append(order)
+
+
+def price_to_tick(price: float) -> int:
+    """Convert a dollar price (0.01 - 0.99) to integer cents"""
+    return int(round(price * 100))
+
+
+class PriceLevelAgg:
+    """Running totals for one price level: remaining quantity and live order count"""
+    __slots__ = ("quantity", "count")
+
+    def __init__(self):
+        self.quantity = 0
+        self.count = 0
+
+
+@lru_cache(maxsize=4096)
+def cost_lamports(price_tick: int, quantity: int, one_dollar_lamports: int) -> int:
+    """
+    Lamports locked by a buy of `quantity` shares at `price_tick` cents, in exact integer math.
+    Memoized since UI presets and the simulator repeat the same (tick, qty) pairs.
+    """
+    return price_tick * quantity * one_dollar_lamports // 100
+
+
+def _new_order_book() -> Dict[str, SortedDict]:
+    """Empty price-indexed order book for a market"""
+    return {
+        "yes_bids": SortedDict(),
+        "yes_asks": SortedDict(),
+        "no_bids": SortedDict(),
+        "no_asks": SortedDict()
+    }
+
+
+def _init_order_book(market_id: str):
+    """Create the (empty) order book and its level aggregates for a market"""
+    order_books[market_id] = _new_order_book()
+    book_aggregates[market_id] = _new_order_book()
+
+
+def _adjust_level(market_id: str, book_key: str, tick: int, quantity_delta: int, count_delta: int):
+    """Apply a change to a price level's aggregate, dropping the level once it is empty"""
+    levels = book_aggregates[market_id][book_key]
+    agg = levels.get(tick)
+    if agg is None:
+        agg = levels[tick] = PriceLevelAgg()
+    agg.quantity += quantity_delta
+    agg.count += count_delta
+    if agg.count <= 0 and agg.quantity <= 0:
+        del levels[tick]
+
+
+def _add_to_book(market_id: str, book_key: str, order: Order):
+    """Queue an order at the back of its price level (time priority)"""
+    if market_id not in order_books:
+        _init_order_book(market_id)
+    levels = order_books[market_id][book_key]
+    tick = order.price_tick
+    if tick not in levels:
+        levels[tick] = deque()
+    levels[tick].append(order)
+    _adjust_level(market_id, book_key, tick, order.remaining_quantity, 1)
+
 
 async def generate_mock_markets():
     """
@@ -165,6 +292,8 @@ async def generate_mock_markets():
     # Fetch live SOL price for accurate $1 equivalent
     sol_price_data = await sol_price_oracle.get_sol_price()
     one_dollar_lamports = sol_price_data.one_dollar_lamports
+    # Costs are keyed on the $1 rate, so entries for the previous rate are dead weight now
+    cost_lamports.cache_clear()
     
     logger.info(f"DEBUG: Using live SOL price: ${sol_price_data.price_usd:.2f}, $1={one_dollar_lamports:,} lamports (source: {sol_price_data.source})")
     
@@ -198,14 +327,10 @@ async def generate_mock_markets():
         )
         
         active_markets[market_id] = market
+        _markets_changed()
         
         # Initialize order book for this market
-        order_books[market_id] = {
-            "yes_bids": [],
-            "yes_asks": [],
-            "no_bids": [],
-            "no_asks": []
-        }
+        _init_order_book(market_id)
         
         # Debug: Log market creation
         logger.info(f"DEBUG: Created market {market_id} for {token['symbol']}")
@@ -213,11 +338,59 @@ async def generate_mock_markets():
     return list(active_markets.values())
 
 
-def try_match_orders(market_id: str) -> List[TradeExecuted]:
+def _match_level(yes_queue: Deque[Order], no_queue: Deque[Order]) -> Tuple[List[Tuple[Order, Order, int]], int, int, int]:
+    """
+    Cross two complementary price levels FIFO-against-FIFO.
+    Only quantities and statuses are touched here; the caller turns the
+    returned fills into trades, share mints and aggregate updates.
+    Returns (fills, total quantity, YES orders filled, NO orders filled).
+    """
+    fills = []
+    total = yes_done = no_done = 0
+    while yes_queue and no_queue:
+        yes_order = yes_queue[0]
+        no_order = no_queue[0]
+        yes_left = yes_order.remaining_quantity
+        no_left = no_order.remaining_quantity
+        match_qty = yes_left if yes_left < no_left else no_left
+        
+        yes_order.filled_quantity += match_qty
+        yes_order.remaining_quantity = yes_left - match_qty
+        if yes_left == match_qty:
+            yes_order.status = OrderStatus.FILLED
+            yes_queue.popleft()
+            yes_done += 1
+        else:
+            yes_order.status = OrderStatus.PARTIALLY_FILLED
+        
+        no_order.filled_quantity += match_qty
+        no_order.remaining_quantity = no_left - match_qty
+        if no_left == match_qty:
+            no_order.status = OrderStatus.FILLED
+            no_queue.popleft()
+            no_done += 1
+        else:
+            no_order.status = OrderStatus.PARTIALLY_FILLED
+        
+        fills.append((yes_order, no_order, match_qty))
+        total += match_qty
+    return fills, total, yes_done, no_done
+
+
+def try_match_orders(market_id: str, yes_tick_hint: Optional[int] = None) -> List[TradeExecuted]:
     """
     Core Polymarket matching logic:
     When YES price + NO price = $1.00, match orders and mint shares.
     Debug: Attempts to match complementary orders in the order book.
+
+    Prices are integer ticks (cents), so "sums to $1.00" is the exact test
+    yes_tick + no_tick == 100. A YES bid at tick y can only match NO bids at
+    tick 100 - y, so each YES level needs one lookup instead of a scan of
+    every NO order. Within a level, orders fill first-in first-out.
+
+    Every call leaves the book uncrossed, so after adding orders at one
+    complementary pair of levels only that pair can match: pass its YES tick
+    as yes_tick_hint to skip the sweep over the other levels.
     """
     if market_id not in order_books:
         return []
@@ -229,82 +402,114 @@ def try_match_orders(market_id: str) -> List[TradeExecuted]:
     if not market:
         return []
     
-    # Sort bids (buy orders) by price descending (highest first)
-    # Sort asks (sell orders) by price ascending (lowest first)
-    yes_bids = sorted([o for o in book["yes_bids"] if o.status == OrderStatus.OPEN], 
-                      key=lambda x: x.price, reverse=True)
-    no_bids = sorted([o for o in book["no_bids"] if o.status == OrderStatus.OPEN], 
-                     key=lambda x: x.price, reverse=True)
-    
-    # Try to match YES bid with NO bid where prices sum to $1
-    for yes_order in yes_bids:
-        for no_order in no_bids:
-            # Core rule: YES price + NO price must equal $1.00
-            if abs(yes_order.price + no_order.price - 1.0) < 0.001:
-                # Calculate match quantity
-                match_qty = min(yes_order.remaining_quantity, no_order.remaining_quantity)
-                
-                if match_qty > 0:
-                    # Debug: Log match
-                    logger.info(f"DEBUG: Matching YES@{yes_order.price} with NO@{no_order.price}, qty={match_qty}")
-                    
-                    # Update orders
-                    yes_order.filled_quantity += match_qty
-                    yes_order.remaining_quantity -= match_qty
-                    if yes_order.remaining_quantity == 0:
-                        yes_order.status = OrderStatus.FILLED
-                    else:
-                        yes_order.status = OrderStatus.PARTIALLY_FILLED
-                    
-                    no_order.filled_quantity += match_qty
-                    no_order.remaining_quantity -= match_qty
-                    if no_order.remaining_quantity == 0:
-                        no_order.status = OrderStatus.FILLED
-                    else:
-                        no_order.status = OrderStatus.PARTIALLY_FILLED
-                    
-                    # Update user shares (mint shares to buyers)
-                    _update_user_shares(yes_order.owner, market_id, match_qty, 0)
-                    _update_user_shares(no_order.owner, market_id, 0, match_qty)
-                    
-                    # Update market state
-                    market.yes_shares_supply += match_qty
-                    market.no_shares_supply += match_qty
-                    market.yes_price = yes_order.price
-                    market.no_price = no_order.price
-                    market.last_updated = datetime.now().isoformat()
-                    
-                    # Calculate volume
-                    volume_lamports = match_qty * market.one_dollar_lamports
-                    market.total_volume += volume_lamports / 1e9  # Convert to SOL
-                    market.total_volume_usd += match_qty  # Each share pair = $1
-                    
-                    # Record trade
-                    trade = TradeExecuted(
-                        id=str(uuid.uuid4()),
-                        market_id=market_id,
-                        yes_order_id=yes_order.id,
-                        no_order_id=no_order.id,
-                        yes_owner=yes_order.owner,
-                        no_owner=no_order.owner,
-                        yes_price=yes_order.price,
-                        no_price=no_order.price,
-                        quantity=match_qty,
-                        timestamp=datetime.now().isoformat()
-                    )
-                    trades.append(trade)
-                    executed_trades.append(trade)
+    yes_bids = book["yes_bids"]
+    no_bids = book["no_bids"]
+    timestamp = now_iso()
+    matched_qty = 0
+    last_yes_tick = last_no_tick = 0
+    
+    if yes_tick_hint is None:
+        # Walk YES levels from the highest price down
+        candidate_ticks = list(yes_bids.irange(reverse=True))
+    else:
+        candidate_ticks = [yes_tick_hint] if yes_tick_hint in yes_bids else []
+    
+    for yes_tick in candidate_ticks:
+        no_tick = 100 - yes_tick
+        no_queue = no_bids.get(no_tick)
+        if not no_queue:
+            continue
+        yes_queue = yes_bids[yes_tick]
+        
+        fills, level_qty, yes_done, no_done = _match_level(yes_queue, no_queue)
+        if not fills:
+            continue
+        
+        # One aggregate update per level rather than per fill
+        _adjust_level(market_id, "yes_bids", yes_tick, -level_qty, -yes_done)
+        _adjust_level(market_id, "no_bids", no_tick, -level_qty, -no_done)
+        matched_qty += level_qty
+        last_yes_tick, last_no_tick = yes_tick, no_tick
+        
+        for yes_order, no_order, match_qty in fills:
+            # Debug: Log match
+            logger.info("DEBUG: Matching YES@%s with NO@%s, qty=%s", yes_order.price, no_order.price, match_qty)
+            
+            # Update user shares (mint shares to buyers)
+            _update_user_shares(yes_order.owner, market_id, match_qty, 0)
+            _update_user_shares(no_order.owner, market_id, 0, match_qty)
+            
+            # Record trade
+            trade = TradeExecuted(
+                id=str(uuid.uuid4()),
+                market_id=market_id,
+                yes_order_id=yes_order.id,
+                no_order_id=no_order.id,
+                yes_owner=yes_order.owner,
+                no_owner=no_order.owner,
+                yes_price=yes_order.price,
+                no_price=no_order.price,
+                quantity=match_qty,
+                timestamp=timestamp
+            )
+            executed_trades.append(trade)
+        
+        # Drop drained price levels
+        if not yes_queue:
+            del yes_bids[yes_tick]
+        if not no_queue:
+            del no_bids[no_tick]
+    
+    if executed_trades:
+        # Apply market state once per batch, priced at the last fill
+        market.yes_shares_supply += matched_qty
+        market.no_shares_supply += matched_qty
+        market.yes_price = last_yes_tick / 100
+        market.no_price = last_no_tick / 100
+        market.last_updated = timestamp
+        
+        # Calculate volume
+        volume_lamports = matched_qty * market.one_dollar_lamports
+        market.total_volume += volume_lamports / 1e9  # Convert to SOL
+        market.total_volume_usd += matched_qty  # Each share pair = $1
+        
+        trades_by_market[market_id].extend(executed_trades)
+        _markets_changed()
     
     return executed_trades
 
 
+def _book_key(order: Order) -> str:
+    """Which side of the book an order rests on"""
+    return f"{order.side.value.lower()}_{'asks' if order.is_sell else 'bids'}"
+
+
+def _remove_from_book(order: Order):
+    """Take a resting order out of its price level (e.g. on cancel)"""
+    book = order_books.get(order.market_id)
+    if not book:
+        return
+    book_key = _book_key(order)
+    levels = book[book_key]
+    tick = order.price_tick
+    queue = levels.get(tick)
+    if queue is None:
+        return
+    try:
+        queue.remove(order)
+    except ValueError:
+        return
+    if not queue:
+        del levels[tick]
+    _adjust_level(order.market_id, book_key, tick, -order.remaining_quantity, -1)
+
+
 def _update_user_shares(wallet: str, market_id: str, yes_delta: int, no_delta: int):
     """Helper to update user share balances"""
-    if wallet not in user_shares:
-        user_shares[wallet] = {}
-    
-    if market_id not in user_shares[wallet]:
-        user_shares[wallet][market_id] = UserShares(
+    key = (wallet, market_id)
+    shares = user_shares.get(key)
+    if shares is None:
+        shares = user_shares[key] = UserShares(
             owner=wallet,
             market_id=market_id,
             yes_shares=0,
@@ -313,10 +518,39 @@ def _update_user_shares(wallet: str, market_id: str, yes_delta: int, no_delta: i
             no_shares_locked=0
         )
     
-    shares = user_shares[wallet][market_id]
     shares.yes_shares += yes_delta
     shares.no_shares += no_delta
 
+async def broadcast_price_update(market_id: str, executed: List[TradeExecuted]):
+    """
+    Push the market's new prices to every subscriber after a batch of fills.
+    The frame is encoded once and sent to all sockets concurrently; sockets
+    whose send fails are dropped without affecting the others.
+    """
+    sockets = subscribers.get(market_id)
+    market = active_markets.get(market_id)
+    if not sockets or not market or not executed:
+        return
+    
+    payload = orjson.dumps({
+        "type": "price_update",
+        "market_id": market_id,
+        "yes_price": market.yes_price,
+        "no_price": market.no_price,
+        "timestamp": market.last_updated,
+        "last_trade_quantity": executed[-1].quantity
+    }).decode()
+    
+    targets = list(sockets)
+    results = await asyncio.gather(*(ws.send_text(payload) for ws in targets), return_exceptions=True)
+    for ws, result in zip(targets, results):
+        if isinstance(result, Exception):
+            sockets.discard(ws)
+
+
+_sim_rng = np.random.default_rng()
+
+
 async def simulate_market_activity():
     """
     Simulate market makers placing orders to create liquidity.
@@ -326,56 +560,69 @@ async def simulate_market_activity():
     await asyncio.sleep(3)  # Wait for markets to initialize
     
     while True:
-        for market_id, market in active_markets.items():
+        markets = list(active_markets.items())
+        n = len(markets)
+        # Draw this cycle's randomness for every market in one batch
+        coins = _sim_rng.random(n).tolist()
+        yes_ticks = _sim_rng.integers(20, 81, n).tolist()
+        quantities = _sim_rng.integers(10, 101, n).tolist()
+        makers = _sim_rng.integers(1, 6, (n, 2)).tolist()
+        
+        for i, (market_id, market) in enumerate(markets):
             if market.status == "active":
                 # Simulate a market maker placing complementary orders
-                if random.random() < 0.3:  # 30% chance each cycle
-                    # Random price between 0.20 and 0.80
-                    yes_price = round(random.uniform(0.20, 0.80), 2)
-                    no_price = round(1.0 - yes_price, 2)
-                    quantity = random.randint(10, 100)
+                if coins[i] < 0.3:  # 30% chance each cycle
+                    # Random price between 0.20 and 0.80 (in cents so YES + NO is exactly $1)
+                    yes_tick = yes_ticks[i]
+                    no_tick = 100 - yes_tick
+                    yes_price = yes_tick / 100
+                    no_price = no_tick / 100
+                    quantity = quantities[i]
+                    yes_maker, no_maker = makers[i]
                     
                     # Create matching YES and NO orders
                     yes_order = Order(
                         id=str(uuid.uuid4()),
                         market_id=market_id,
-                        owner=f"MM_{random.randint(1,5)}",  # Mock market maker
+                        owner=f"MM_{yes_maker}",  # Mock market maker
                         side=OrderSide.YES,
                         price=yes_price,
+                        price_tick=yes_tick,
                         quantity=quantity,
                         filled_quantity=0,
                         remaining_quantity=quantity,
-                        lamports_deposited=int(yes_price * quantity * market.one_dollar_lamports),
+                        lamports_deposited=cost_lamports(yes_tick, quantity, market.one_dollar_lamports),
                         status=OrderStatus.OPEN,
                         is_sell=False,
-                        created_at=datetime.now().isoformat()
+                        created_at=now_iso()
                     )
                     
                     no_order = Order(
                         id=str(uuid.uuid4()),
                         market_id=market_id,
-                        owner=f"MM_{random.randint(1,5)}",
+                        owner=f"MM_{no_maker}",
                         side=OrderSide.NO,
                         price=no_price,
+                        price_tick=no_tick,
                         quantity=quantity,
                         filled_quantity=0,
                         remaining_quantity=quantity,
-                        lamports_deposited=int(no_price * quantity * market.one_dollar_lamports),
+                        lamports_deposited=cost_lamports(no_tick, quantity, market.one_dollar_lamports),
                         status=OrderStatus.OPEN,
                         is_sell=False,
-                        created_at=datetime.now().isoformat()
+                        created_at=now_iso()
                     )
                     
-                    # Add to order book
-                    order_books[market_id]["yes_bids"].append(yes_order)
-                    order_books[market_id]["no_bids"].append(no_order)
-                    all_orders[yes_order.id] = yes_order
-                    all_orders[no_order.id] = no_order
-                    
-                    # Try to match
-                    executed = try_match_orders(market_id)
+                    # Add to order book and try to match
+                    async with _market_lock(market_id):
+                        _add_to_book(market_id, "yes_bids", yes_order)
+                        _add_to_book(market_id, "no_bids", no_order)
+                        _record_order(yes_order)
+                        _record_order(no_order)
+                        executed = try_match_orders(market_id, yes_tick)
                     if executed:
-                        logger.info(f"DEBUG: Executed {len(executed)} trades for {market.token_symbol}")
+                        logger.info("DEBUG: Executed %d trades for %s", len(executed), market.token_symbol)
+                        await broadcast_price_update(market_id, executed)
         
         await asyncio.sleep(5)  # Simulate activity every 5 seconds
 
@@ -387,7 +634,10 @@ async def root():
 @app.get("/markets", response_model=List[Market])
 async def get_markets():
     """Get all active markets"""
-    return list(active_markets.values())
+    global _markets_snapshot
+    if _markets_snapshot is None:
+        _markets_snapshot = orjson.dumps([m.model_dump() for m in active_markets.values()])
+    return Response(content=_markets_snapshot, media_type="application/json")
 
 @app.get("/markets/{market_id}", response_model=Market)
 async def get_market(market_id: str):
@@ -442,7 +692,7 @@ async def refresh_sol_price():
 # Order Book API Endpoints - Polymarket Style CLOB
 # ============================================================================
 
-@app.get("/orderbook/{market_id}", response_model=OrderBook)
+@app.get("/orderbook/{market_id}", responses={200: {"model": OrderBook}})
 async def get_orderbook(market_id: str):
     """
     Get the order book for a market.
@@ -451,43 +701,41 @@ async def get_orderbook(market_id: str):
     if market_id not in active_markets:
         raise HTTPException(status_code=404, detail="Market not found")
     
-    if market_id not in order_books:
-        order_books[market_id] = {"yes_bids": [], "yes_asks": [], "no_bids": [], "no_asks": []}
+    if market_id not in book_aggregates:
+        _init_order_book(market_id)
     
-    book = order_books[market_id]
+    book = book_aggregates[market_id]
     
-    # Aggregate orders by price level
-    def aggregate_levels(orders: List[Order], descending: bool = True) -> List[OrderBookLevel]:
-        price_levels = defaultdict(lambda: {"quantity": 0, "count": 0})
-        for order in orders:
-            if order.status in [OrderStatus.OPEN, OrderStatus.PARTIALLY_FILLED]:
-                price_levels[order.price]["quantity"] += order.remaining_quantity
-                price_levels[order.price]["count"] += 1
-        
-        levels = [
-            OrderBookLevel(price=p, quantity=d["quantity"], num_orders=d["count"])
-            for p, d in price_levels.items()
+    # Price levels are aggregated as orders come and go, and already sorted by tick.
+    # Built as plain dicts (shaped like OrderBookLevel) and handed straight to orjson.
+    def aggregate_levels(levels: SortedDict, descending: bool = True) -> List[dict]:
+        items = reversed(levels.items()) if descending else levels.items()
+        return [
+            {"price": tick / 100, "quantity": agg.quantity, "num_orders": agg.count}
+            for tick, agg in items
         ]
-        return sorted(levels, key=lambda x: x.price, reverse=descending)
     
     yes_bids = aggregate_levels(book["yes_bids"], descending=True)
     yes_asks = aggregate_levels(book["yes_asks"], descending=False)
     no_bids = aggregate_levels(book["no_bids"], descending=True)
     no_asks = aggregate_levels(book["no_asks"], descending=False)
     
-    return OrderBook(
-        market_id=market_id,
-        yes_bids=yes_bids,
-        yes_asks=yes_asks,
-        no_bids=no_bids,
-        no_asks=no_asks,
-        best_yes_bid=yes_bids[0].price if yes_bids else None,
-        best_yes_ask=yes_asks[0].price if yes_asks else None,
-        best_no_bid=no_bids[0].price if no_bids else None,
-        best_no_ask=no_asks[0].price if no_asks else None,
-        spread=abs(yes_bids[0].price - yes_asks[0].price) if yes_bids and yes_asks else None,
-        last_updated=datetime.now().isoformat()
-    )
+    best_yes_bid = yes_bids[0]["price"] if yes_bids else None
+    best_yes_ask = yes_asks[0]["price"] if yes_asks else None
+    
+    return ORJSONResponse({
+        "market_id": market_id,
+        "yes_bids": yes_bids,
+        "yes_asks": yes_asks,
+        "no_bids": no_bids,
+        "no_asks": no_asks,
+        "best_yes_bid": best_yes_bid,
+        "best_yes_ask": best_yes_ask,
+        "best_no_bid": no_bids[0]["price"] if no_bids else None,
+        "best_no_ask": no_asks[0]["price"] if no_asks else None,
+        "spread": abs(best_yes_bid - best_yes_ask) if yes_bids and yes_asks else None,
+        "last_updated": now_iso()
+    })
 
 
 @app.post("/orders/place")
@@ -501,15 +749,17 @@ async def place_order(request: PlaceOrderRequest):
     
     market = active_markets[request.market_id]
     
-    # Validate price (must be between 0 and 1)
-    if request.price <= 0 or request.price >= 1.0:
+    # Validate price (must be between 0 and 1), snapped to whole cents
+    price_tick = price_to_tick(request.price)
+    if price_tick < 1 or price_tick > 99:
         raise HTTPException(status_code=400, detail="Price must be between $0.01 and $0.99")
+    price = price_tick / 100
     
     if request.quantity <= 0:
         raise HTTPException(status_code=400, detail="Quantity must be positive")
     
     # Calculate cost in lamports
-    cost_lamports = int(request.price * request.quantity * market.one_dollar_lamports)
+    order_cost = cost_lamports(price_tick, request.quantity, market.one_dollar_lamports)
     
     # Create order
     order = Order(
@@ -517,32 +767,32 @@ async def place_order(request: PlaceOrderRequest):
         market_id=request.market_id,
         owner=request.wallet_address,
         side=request.side,
-        price=request.price,
+        price=price,
+        price_tick=price_tick,
         quantity=request.quantity,
         filled_quantity=0,
         remaining_quantity=request.quantity,
-        lamports_deposited=cost_lamports,
+        lamports_deposited=order_cost,
         status=OrderStatus.OPEN,
         is_sell=request.is_sell,
-        created_at=datetime.now().isoformat()
+        created_at=now_iso()
     )
     
-    # Add to order book
-    if request.market_id not in order_books:
-        order_books[request.market_id] = {"yes_bids": [], "yes_asks": [], "no_bids": [], "no_asks": []}
-    
-    book_key = f"{request.side.value.lower()}_{'asks' if request.is_sell else 'bids'}"
-    order_books[request.market_id][book_key].append(order)
-    all_orders[order.id] = order
-    
-    # Debug: Log order placement
-    logger.info(f"DEBUG: Order placed - {request.side.value} @ ${request.price} x {request.quantity}")
-    
-    # Try to match orders
-    executed_trades = try_match_orders(request.market_id)
+    # Add to order book and try to match, serialized against other writers of this book
+    async with _market_lock(request.market_id):
+        book_key = _book_key(order)
+        _add_to_book(request.market_id, book_key, order)
+        _record_order(order)
+        
+        # Debug: Log order placement
+        logger.info("DEBUG: Order placed - %s @ $%s x %s", request.side.value, price, request.quantity)
+        
+        yes_tick = price_tick if request.side == OrderSide.YES else 100 - price_tick
+        executed_trades = try_match_orders(request.market_id, yes_tick)
+    await broadcast_price_update(request.market_id, executed_trades)
     
     return {
-        "order": order,
+        "order": msgspec.to_builtins(order),
         "trades_executed": len(executed_trades),
         "message": f"Order placed. {len(executed_trades)} trades executed."
     }
@@ -559,16 +809,17 @@ async def cancel_order(order_id: str, wallet_address: str):
     if order.owner != wallet_address:
         raise HTTPException(status_code=403, detail="Not authorized to cancel this order")
     
-    if order.status not in [OrderStatus.OPEN, OrderStatus.PARTIALLY_FILLED]:
-        raise HTTPException(status_code=400, detail="Order cannot be cancelled")
-    
-    order.status = OrderStatus.CANCELLED
+    async with _market_lock(order.market_id):
+        if order.status not in [OrderStatus.OPEN, OrderStatus.PARTIALLY_FILLED]:
+            raise HTTPException(status_code=400, detail="Order cannot be cancelled")
+        
+        order.status = OrderStatus.CANCELLED
+        _remove_from_book(order)
     
     # Calculate refund
-    refund_ratio = order.remaining_quantity / order.quantity if order.quantity > 0 else 0
-    refund_lamports = int(order.lamports_deposited * refund_ratio)
+    refund_lamports = order.lamports_deposited * order.remaining_quantity // order.quantity if order.quantity > 0 else 0
     
-    logger.info(f"DEBUG: Order {order_id} cancelled, refund: {refund_lamports} lamports")
+    logger.info("DEBUG: Order %s cancelled, refund: %s lamports", order_id, refund_lamports)
     
     return {
         "order_id": order_id,
@@ -580,7 +831,8 @@ async def cancel_order(order_id: str, wallet_address: str):
 @app.get("/shares/{wallet_address}/{market_id}")
 async def get_user_shares(wallet_address: str, market_id: str):
     """Get user's share holdings for a market"""
-    if wallet_address not in user_shares:
+    shares = user_shares.get((wallet_address, market_id))
+    if shares is None:
         return UserShares(
             owner=wallet_address,
             market_id=market_id,
@@ -590,74 +842,82 @@ async def get_user_shares(wallet_address: str, market_id: str):
             no_shares_locked=0
         )
     
-    if market_id not in user_shares[wallet_address]:
-        return UserShares(
-            owner=wallet_address,
-            market_id=market_id,
-            yes_shares=0,
-            no_shares=0,
-            yes_shares_locked=0,
-            no_shares_locked=0
-        )
-    
-    return user_shares[wallet_address][market_id]
+    return shares
 
 
 @app.get("/trades/{market_id}")
 async def get_trades(market_id: str, limit: int = 50):
     """Get recent trades for a market"""
-    market_trades = [t for t in trades if t.market_id == market_id]
-    return sorted(market_trades, key=lambda x: x.timestamp, reverse=True)[:limit]
+    market_trades = trades_by_market.get(market_id, ())
+    # Trades are appended in execution order, so the newest are at the end
+    return msgspec.to_builtins(list(islice(reversed(market_trades), max(limit, 0))))
 
 
 @app.get("/orders/{wallet_address}")
 async def get_user_orders(wallet_address: str, market_id: Optional[str] = None):
     """Get all orders for a user, optionally filtered by market"""
-    user_orders = [o for o in all_orders.values() if o.owner == wallet_address]
+    user_orders = orders_by_owner.get(wallet_address, [])
     
     if market_id:
         user_orders = [o for o in user_orders if o.market_id == market_id]
     
-    return sorted(user_orders, key=lambda x: x.created_at, reverse=True)
+    # Orders are appended as they are placed, so newest first is just the reverse
+    return msgspec.to_builtins(user_orders[::-1])
+
+# Templated frames for the WebSocket endpoint, so echoes/errors skip building a dict per message
+_ECHO_PREFIX = '{"type":"echo","message":"Received: '
+_ECHO_SUFFIX = '"}'
+_INVALID_JSON_FRAME = orjson.dumps({"type": "error", "message": "Invalid JSON format"}).decode()
+
+
+def _echo_frame(data: str) -> str:
+    # orjson.dumps(str) yields the quoted, escaped JSON string; drop the quotes and splice it in
+    return _ECHO_PREFIX + orjson.dumps(data)[1:-1].decode() + _ECHO_SUFFIX
+
 
 @app.websocket("/ws/{connection_id}")
 async def websocket_endpoint(websocket: WebSocket, connection_id: str):
     """Simple WebSocket endpoint"""
     await websocket.accept()
+    subscribed: Set[str] = set()
     
     try:
         while True:
             data = await websocket.receive_text()
             
             try:
-                message = json.loads(data)
+                message = orjson.loads(data)
                 
                 # Handle subscription messages
                 if message.get("type") == "subscribe":
                     market_id = message.get("market_id")
-                    await websocket.send_text(json.dumps({
+                    if market_id:
+                        subscribers[market_id].add(websocket)
+                        subscribed.add(market_id)
+                    await websocket.send_text(orjson.dumps({
                         "type": "subscribed",
                         "market_id": market_id
-                    }))
+                    }).decode())
                 
                 # Echo back other messages
                 else:
-                    await websocket.send_text(json.dumps({
-                        "type": "echo",
-                        "message": f"Received: {data}"
-                    }))
+                    await websocket.send_text(_echo_frame(data))
                     
-            except json.JSONDecodeError:
-                await websocket.send_text(json.dumps({
-                    "type": "error",
-                    "message": "Invalid JSON format"
-                }))
+            except orjson.JSONDecodeError:
+                await websocket.send_text(_INVALID_JSON_FRAME)
                 
     except WebSocketDisconnect:
-        logger.info(f"WebSocket disconnected: {connection_id}")
+        logger.info("WebSocket disconnected: %s", connection_id)
     except Exception as e:
-        logger.error(f"WebSocket error for {connection_id}: {e}")
+        logger.error("WebSocket error for %s: %s", connection_id, e)
         await websocket.close()
+    finally:
+        for market_id in subscribed:
+            sockets = subscribers.get(market_id)
+            if sockets is not None:
+                sockets.discard(websocket)
+                if not sockets:
+                    del subscribers[market_id]
 
 # Background tasks
 @app.on_event("startup")
@@ -685,6 +945,8 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down MemeMarket Protocol API...")
+    await close_shared_session()
+    await sol_price_oracle.close()
     logger.info("API shutdown complete")
 
 if __name__ == "__main__":
@@ -1,19 +1,49 @@
 import asyncio
 import aiohttp
-from typing import Dict, List, Optional, Set
+import heapq
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
 from datetime import datetime, timedelta
 import logging
-from solana.rpc.async_client import AsyncClient
 from solana.rpc.websocket_api import connect
-from solana.rpc.types import RPCResponse
+from solders.commitment_config import CommitmentLevel
+from solders.pubkey import Pubkey
+from solders.rpc.config import RpcTransactionLogsConfig, RpcTransactionLogsFilterMentions
+from solders.rpc.requests import LogsSubscribe, LogsUnsubscribe
+from solders.rpc.responses import LogsNotification, SubscriptionResult
 import base58
+import orjson
 from dataclasses import dataclass
+from msgspec.structs import asdict
 
 from ..api.pumpfun import PumpFunAPI, PumpFunToken
-from ..api.dexscreener import DexScreenerAPI, DexScreenerToken
+from ..api.dexscreener import DexScreenerAPI, DexScreenerToken, DexPrice
+from ..api.http_session import ConcurrencyLimiter, SingleFlight, get_shared_session
 
 logger = logging.getLogger(__name__)
 
+# Max getTransaction calls per JSON-RPC batch request (public RPCs reject larger batches)
+RPC_BATCH_SIZE = 100
+
+# Polling intervals (seconds) for the scheduled jobs, normal and after an error
+PUMPFUN_POLL_INTERVAL_SECONDS = 30
+PUMPFUN_ERROR_INTERVAL_SECONDS = 60
+DEXSCREENER_POLL_INTERVAL_SECONDS = 10
+DEXSCREENER_ERROR_INTERVAL_SECONDS = 30
+
+# DexScreener price lookups in flight at once per polling tick
+DEXSCREENER_POLL_CONCURRENCY = 20
+
+# get_token_metrics results kept in-process
+METRICS_CACHE_TTL_SECONDS = 30
+METRICS_CACHE_MAX_SIZE = 4096
+
+# Solana logs streaming
+LOGS_SUBSCRIBE_CONFIG = RpcTransactionLogsConfig(CommitmentLevel.Confirmed)
+LOGS_RESUBSCRIBE_DEBOUNCE_SECONDS = 1.0
+LOGS_RECONNECT_DELAY_SECONDS = 5
+
 @dataclass
 class TokenPriceUpdate:
     mint_address: str
@@ -27,27 +57,56 @@ class TokenPriceUpdate:
 class BlockchainMonitor:
     def __init__(self, rpc_url: str = "https://api.mainnet-beta.solana.com"):
         self.rpc_url = rpc_url
-        self.rpc_client: Optional[AsyncClient] = None
+        self.ws_url = rpc_url.replace("https://", "wss://", 1).replace("http://", "ws://", 1)
         self.ws_connection = None
+        # One pooled session for every HTTP call the monitor makes; created in __aenter__
+        self._http: Optional[aiohttp.ClientSession] = None
         self.pumpfun_api = PumpFunAPI()
         self.dexscreener_api = DexScreenerAPI()
         self.monitored_tokens: Set[str] = set()
+        # Immutable copy of monitored_tokens, rebuilt on add/remove, for loops to iterate without copying per tick
+        self._tokens_snapshot: Tuple[str, ...] = ()
         self.price_callbacks: List[callable] = []
+        # Split once at registration so notifying doesn't re-inspect every callback
+        self._sync_callbacks: List[callable] = []
+        self._async_callbacks: List[callable] = []
         self.is_running = False
+        # The scheduler and transaction-stream tasks while monitoring; stop_monitoring cancels them
+        self._monitor_tasks: List[asyncio.Task] = []
+        # Polling jobs as a heap of (next_run, name, job, interval, error_interval), driven by _scheduler_loop
+        self._jobs: List[Tuple[float, str, Callable[[], Awaitable[None]], float, float]] = []
+        self._dexscreener_limiter = ConcurrencyLimiter(DEXSCREENER_POLL_CONCURRENCY)
+        # Last DexPrice seen per mint; an identical object means an unchanged payload
+        self._last_dex_prices: Dict[str, DexPrice] = {}
+        # mint -> (time.monotonic() stored, metrics), LRU-bounded; concurrent misses share one fetch
+        self._metrics_cache: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._metrics_singleflight = SingleFlight()
+        # Set when monitored_tokens changes so the logs stream re-subscribes
+        self._tokens_changed = asyncio.Event()
 
     async def __aenter__(self):
-        self.rpc_client = AsyncClient(self.rpc_url)
+        self._http = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=50, ttl_dns_cache=300)
+        )
+        # API clients borrow the monitor's session instead of managing their own
+        self.pumpfun_api = PumpFunAPI(session=self._http)
+        self.dexscreener_api = DexScreenerAPI(session=self._http)
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.rpc_client:
-            await self.rpc_client.close()
         if self.ws_connection:
             await self.ws_connection.close()
+        if self._http and not self._http.closed:
+            await self._http.close()
+        self._http = None
 
     def add_price_callback(self, callback: callable):
         """Add callback function for price updates"""
         self.price_callbacks.append(callback)
+        if asyncio.iscoroutinefunction(callback):
+            self._async_callbacks.append(callback)
+        else:
+            self._sync_callbacks.append(callback)
 
     async def start_monitoring(self):
         """Start real-time monitoring"""
@@ -57,139 +116,290 @@ class BlockchainMonitor:
         self.is_running = True
         logger.info("Starting blockchain monitoring...")
 
-        # Start multiple monitoring tasks
-        tasks = [
-            self._monitor_pumpfun_tokens(),
-            self._monitor_dexscreener_prices(),
-            self._monitor_solana_transactions()
+        # The polling jobs share one scheduler; the transaction stream runs on its own
+        now = time.monotonic()
+        self._jobs = [
+            (now, "pumpfun", self._poll_pumpfun_tokens,
+             PUMPFUN_POLL_INTERVAL_SECONDS, PUMPFUN_ERROR_INTERVAL_SECONDS),
+            (now, "dexscreener", self._poll_dexscreener_prices,
+             DEXSCREENER_POLL_INTERVAL_SECONDS, DEXSCREENER_ERROR_INTERVAL_SECONDS),
+        ]
+        heapq.heapify(self._jobs)
+        self._monitor_tasks = [
+            asyncio.create_task(self._scheduler_loop()),
+            asyncio.create_task(self._monitor_solana_transactions())
         ]
 
         try:
-            await asyncio.gather(*tasks)
-        except Exception as e:
-            logger.error(f"Error in monitoring: {e}")
+            # Tasks cancelled by stop_monitoring come back as CancelledError, which isn't logged
+            results = await asyncio.gather(*self._monitor_tasks, return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Error in monitoring: {result}")
         finally:
             self.is_running = False
+            self._monitor_tasks = []
 
     async def stop_monitoring(self):
-        """Stop monitoring"""
+        """Stop monitoring, waking the tasks wherever they are waiting"""
         self.is_running = False
+        for task in self._monitor_tasks:
+            task.cancel()
         logger.info("Stopping blockchain monitoring...")
 
     async def add_token_monitor(self, mint_address: str):
         """Add a token to monitor"""
         self.monitored_tokens.add(mint_address)
+        self._tokens_snapshot = tuple(self.monitored_tokens)
+        self._tokens_changed.set()
         logger.info(f"Added token {mint_address} to monitoring")
 
     async def remove_token_monitor(self, mint_address: str):
         """Remove a token from monitoring"""
         self.monitored_tokens.discard(mint_address)
+        self._tokens_snapshot = tuple(self.monitored_tokens)
+        self._last_dex_prices.pop(mint_address, None)
+        self.dexscreener_api.forget_token_price(mint_address)
+        self._tokens_changed.set()
         logger.info(f"Removed token {mint_address} from monitoring")
 
-    async def _monitor_pumpfun_tokens(self):
-        """Monitor new tokens on pump.fun"""
-        while self.is_running:
-            try:
-                async with self.pumpfun_api:
-                    # Get featured tokens
-                    featured_tokens = await self.pumpfun_api.get_featured_tokens()
-                    
-                    for token in featured_tokens:
-                        if token.mint not in self.monitored_tokens:
-                            await self.add_token_monitor(token.mint)
-                            
-                            # Create price update
-                            price_update = TokenPriceUpdate(
-                                mint_address=token.mint,
-                                symbol=token.symbol,
-                                price_usd=token.current_price,
-                                market_cap=token.market_cap,
-                                volume_24h=0,  # Not available from pump.fun API
-                                price_change_24h=0,  # Not available from pump.fun API
-                                timestamp=datetime.now()
-                            )
-                            
-                            # Notify callbacks
-                            await self._notify_price_update(price_update)
-
-                await asyncio.sleep(30)  # Check every 30 seconds
-
-            except Exception as e:
-                logger.error(f"Error monitoring pump.fun tokens: {e}")
-                await asyncio.sleep(60)  # Wait longer on error
-
-    async def _monitor_dexscreener_prices(self):
-        """Monitor price updates from DexScreener"""
-        while self.is_running:
-            try:
-                async with self.dexscreener_api:
-                    for mint_address in list(self.monitored_tokens):
-                        # Get current price data
-                        token_data = await self.dexscreener_api.get_token_price(mint_address)
-                        
-                        if token_data:
-                            price_update = TokenPriceUpdate(
-                                mint_address=mint_address,
-                                symbol=token_data.baseToken.get("symbol", ""),
-                                price_usd=float(token_data.priceUsd),
-                                market_cap=token_data.marketCap,
-                                volume_24h=float(token_data.volume.get("h24", 0)),
-                                price_change_24h=float(token_data.priceChange.get("h24", 0)),
-                                timestamp=datetime.now()
-                            )
-                            
-                            # Notify callbacks
-                            await self._notify_price_update(price_update)
-
-                await asyncio.sleep(10)  # Update every 10 seconds
-
-            except Exception as e:
-                logger.error(f"Error monitoring DexScreener prices: {e}")
-                await asyncio.sleep(30)
+    async def _scheduler_loop(self):
+        """
+        Run the polling jobs from one coroutine: sleep until the earliest
+        deadline, run every job that is due together, then reschedule each
+        one interval (or its error interval) after it finished.
+        """
+        while self.is_running and self._jobs:
+            sleep_for = self._jobs[0][0] - time.monotonic()
+            if sleep_for > 0:
+                await asyncio.sleep(sleep_for)
+            if not self.is_running:
+                break
+
+            now = time.monotonic()
+            due = []
+            while self._jobs and self._jobs[0][0] <= now:
+                due.append(heapq.heappop(self._jobs))
+
+            results = await asyncio.gather(*(job() for _, _, job, _, _ in due), return_exceptions=True)
+
+            finished = time.monotonic()
+            for (_, name, job, interval, error_interval), result in zip(due, results):
+                delay = interval
+                if isinstance(result, Exception):
+                    logger.error(f"Error in {name} polling job: {result}")
+                    delay = error_interval
+                heapq.heappush(self._jobs, (finished + delay, name, job, interval, error_interval))
+
+    async def _poll_pumpfun_tokens(self):
+        """Pick up new featured tokens on pump.fun"""
+        # Get featured tokens
+        featured_tokens = await self.pumpfun_api.get_featured_tokens()
+        
+        for token in featured_tokens:
+            if token.mint not in self.monitored_tokens:
+                await self.add_token_monitor(token.mint)
+                
+                # Create price update
+                price_update = TokenPriceUpdate(
+                    mint_address=token.mint,
+                    symbol=token.symbol,
+                    price_usd=token.current_price,
+                    market_cap=token.market_cap,
+                    volume_24h=0,  # Not available from pump.fun API
+                    price_change_24h=0,  # Not available from pump.fun API
+                    timestamp=datetime.now()
+                )
+                
+                # Notify callbacks
+                await self._notify_price_update(price_update)
+
+    async def _poll_dexscreener_prices(self):
+        """Fetch current DexScreener prices for all monitored tokens"""
+        # Get current price data for all tokens concurrently (bounded)
+        async def fetch(mint_address: str):
+            async with self._dexscreener_limiter:
+                return mint_address, await self.dexscreener_api.get_dex_price(mint_address)
+        
+        results = await asyncio.gather(
+            *(fetch(mint) for mint in self._tokens_snapshot),
+            return_exceptions=True
+        )
+        
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Error fetching DexScreener price: {result}")
+                continue
+            mint_address, price = result
+            
+            # The API hands back the same object when the payload hasn't changed (304 or same bytes)
+            if price is None or price is self._last_dex_prices.get(mint_address):
+                continue
+            self._last_dex_prices[mint_address] = price
+            
+            price_update = TokenPriceUpdate(
+                mint_address=mint_address,
+                symbol=price.symbol,
+                price_usd=price.priceUsd,
+                market_cap=price.marketCap,
+                volume_24h=price.volume_h24,
+                price_change_24h=price.priceChange_h24,
+                timestamp=datetime.now()
+            )
+            
+            # Notify callbacks
+            await self._notify_price_update(price_update)
 
     async def _monitor_solana_transactions(self):
-        """Monitor Solana blockchain for relevant transactions"""
+        """
+        Stream transactions that mention monitored tokens via logsSubscribe
+        instead of polling signatures. Reconnects after errors.
+        """
         while self.is_running:
             try:
-                if not self.rpc_client:
-                    continue
-
-                # Get recent signatures for monitored tokens
-                for mint_address in list(self.monitored_tokens):
-                    try:
-                        signatures = await self.rpc_client.get_signatures_for_address(
-                            mint_address,
-                            limit=5
-                        )
-                        
-                        # Process new transactions
-                        for sig_info in signatures.value:
-                            if sig_info.confirmation_status == "confirmed":
-                                # Get transaction details
-                                tx = await self.rpc_client.get_transaction(
-                                    sig_info.signature,
-                                    encoding="json",
-                                    commitment="confirmed"
-                                )
-                                
-                                # Analyze transaction for price impact
-                                await self._analyze_transaction(mint_address, tx)
-
-                    except Exception as e:
-                        logger.error(f"Error monitoring transactions for {mint_address}: {e}")
-
-                await asyncio.sleep(15)  # Check every 15 seconds
+                async with connect(self.ws_url) as websocket:
+                    self.ws_connection = websocket
+                    # Subscribe to whatever is monitored right now
+                    self._tokens_changed.set()
+                    await self._stream_transaction_logs(websocket)
 
             except Exception as e:
                 logger.error(f"Error monitoring Solana transactions: {e}")
-                await asyncio.sleep(30)
+                await asyncio.sleep(LOGS_RECONNECT_DELAY_SECONDS)
+            finally:
+                self.ws_connection = None
+
+    async def _stream_transaction_logs(self, websocket):
+        """
+        Keep one logsSubscribe per monitored token (the RPC accepts a single
+        "mentions" address per subscription) on a shared connection, and turn
+        notifications into batched getTransaction lookups. Subscriptions are
+        reconciled, debounced, whenever monitored_tokens changes.
+        """
+        request_id = 0
+        pending: Dict[int, str] = {}          # subscribe request id -> mint
+        subscriptions: Dict[str, int] = {}    # mint -> subscription id
+        sub_to_mint: Dict[int, str] = {}      # subscription id -> mint
+        recv_task: Optional[asyncio.Task] = None
 
-    async def _analyze_transaction(self, mint_address: str, transaction: RPCResponse):
-        """Analyze a transaction for price impact"""
         try:
-            # Extract transaction details
-            tx_data = transaction.value
+            while self.is_running:
+                if self._tokens_changed.is_set():
+                    await asyncio.sleep(LOGS_RESUBSCRIBE_DEBOUNCE_SECONDS)
+                    self._tokens_changed.clear()
+                    wanted = set(self._tokens_snapshot)
+                    requests = []
+
+                    for mint_address in wanted - subscriptions.keys() - set(pending.values()):
+                        try:
+                            mentions = RpcTransactionLogsFilterMentions(Pubkey.from_string(mint_address))
+                        except ValueError:
+                            logger.warning(f"Not subscribing to logs for invalid mint {mint_address}")
+                            continue
+                        request_id += 1
+                        pending[request_id] = mint_address
+                        requests.append(LogsSubscribe(mentions, LOGS_SUBSCRIBE_CONFIG, request_id))
+
+                    for mint_address in subscriptions.keys() - wanted:
+                        subscription = subscriptions.pop(mint_address)
+                        sub_to_mint.pop(subscription, None)
+                        request_id += 1
+                        requests.append(LogsUnsubscribe(subscription, request_id))
+
+                    if requests:
+                        await websocket.send_data(requests)
+
+                # Wait for notifications, or for the token set to change
+                if recv_task is None:
+                    recv_task = asyncio.ensure_future(websocket.recv())
+                change_task = asyncio.ensure_future(self._tokens_changed.wait())
+                done, _ = await asyncio.wait({recv_task, change_task}, return_when=asyncio.FIRST_COMPLETED)
+                change_task.cancel()
+                if recv_task not in done:
+                    continue
+                messages = recv_task.result()
+                recv_task = None
+
+                sig_to_mint: Dict[str, str] = {}
+                for message in messages:
+                    if isinstance(message, SubscriptionResult):
+                        mint_address = pending.pop(message.id, None)
+                        if mint_address is not None:
+                            subscriptions[mint_address] = message.result
+                            sub_to_mint[message.result] = mint_address
+                            if mint_address not in self.monitored_tokens:
+                                # Removed while the subscribe was in flight
+                                self._tokens_changed.set()
+                    elif isinstance(message, LogsNotification):
+                        mint_address = sub_to_mint.get(message.subscription)
+                        value = message.result.value
+                        if mint_address and value.err is None:
+                            sig_to_mint[str(value.signature)] = mint_address
+
+                if not sig_to_mint:
+                    continue
+
+                # Get transaction details for this burst of notifications in one batch
+                signatures = list(sig_to_mint)
+                try:
+                    transactions = await self._get_transactions_batch(signatures)
+                except Exception as e:
+                    logger.error(f"Error fetching transaction batch: {e}")
+                    continue
+
+                # Analyze transactions for price impact
+                for signature, tx in zip(signatures, transactions):
+                    if tx:
+                        await self._analyze_transaction(sig_to_mint[signature], tx)
+        finally:
+            if recv_task is not None:
+                recv_task.cancel()
+
+    async def _get_transactions_batch(self, signatures: List[str]) -> List[Optional[Dict]]:
+        """
+        Fetch transactions with JSON-RPC batch requests (RPC_BATCH_SIZE per POST)
+        instead of one getTransaction round trip each. Results line up with
+        `signatures`; missing or failed entries are None.
+        """
+        results: List[Optional[Dict]] = [None] * len(signatures)
+        session = self._http or get_shared_session()
+        
+        for offset in range(0, len(signatures), RPC_BATCH_SIZE):
+            chunk = signatures[offset:offset + RPC_BATCH_SIZE]
+            payload = [
+                {
+                    "jsonrpc": "2.0",
+                    "id": offset + i,
+                    "method": "getTransaction",
+                    "params": [sig, {"encoding": "json", "commitment": "confirmed", "maxSupportedTransactionVersion": 0}]
+                }
+                for i, sig in enumerate(chunk)
+            ]
+            
+            async with session.post(
+                self.rpc_url,
+                data=orjson.dumps(payload),
+                headers={"Content-Type": "application/json"}
+            ) as response:
+                if response.status != 200:
+                    logger.warning(f"RPC batch request failed with status {response.status}")
+                    continue
+                body = orjson.loads(await response.read())
+            
+            if not isinstance(body, list):
+                logger.warning(f"Unexpected RPC batch response: {body}")
+                continue
             
+            for item in body:
+                idx = item.get("id")
+                if isinstance(idx, int) and 0 <= idx < len(results):
+                    results[idx] = item.get("result")
+        
+        return results
+
+    async def _analyze_transaction(self, mint_address: str, tx_data: Dict):
+        """Analyze a transaction (getTransaction result) for price impact"""
+        try:
             # Look for DEX interactions (Raydium, Orca, etc.)
             # This is simplified - in production you'd want to parse specific instructions
             if "meta" in tx_data and tx_data["meta"]:
@@ -204,32 +414,59 @@ class BlockchainMonitor:
             logger.error(f"Error analyzing transaction: {e}")
 
     async def _notify_price_update(self, price_update: TokenPriceUpdate):
-        """Notify all callbacks of price update"""
-        for callback in self.price_callbacks:
+        """Notify all callbacks of price update; async callbacks run concurrently"""
+        for callback in self._sync_callbacks:
             try:
-                if asyncio.iscoroutinefunction(callback):
-                    await callback(price_update)
-                else:
-                    callback(price_update)
+                callback(price_update)
             except Exception as e:
                 logger.error(f"Error in price callback: {e}")
 
-    async def get_token_metrics(self, mint_address: str) -> Optional[Dict]:
-        """Get comprehensive metrics for a token"""
-        try:
-            # Get data from both APIs
-            async with self.pumpfun_api, self.dexscreener_api:
-                pumpfun_data = await self.pumpfun_api.get_token_info(mint_address)
-                dexscreener_data = await self.dexscreener_api.get_token_price(mint_address)
-
-                metrics = {
-                    "mint_address": mint_address,
-                    "pumpfun_data": pumpfun_data.__dict__ if pumpfun_data else None,
-                    "dexscreener_data": dexscreener_data.__dict__ if dexscreener_data else None,
-                    "last_updated": datetime.now()
-                }
+        if self._async_callbacks:
+            results = await asyncio.gather(
+                *(callback(price_update) for callback in self._async_callbacks),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Error in price callback: {result}")
 
+    async def get_token_metrics(self, mint_address: str) -> Optional[Dict]:
+        """
+        Get comprehensive metrics for a token.
+        Results are cached for METRICS_CACHE_TTL_SECONDS and concurrent callers
+        for the same mint share one fetch; treat the returned dict as read-only.
+        """
+        entry = self._metrics_cache.get(mint_address)
+        if entry is not None:
+            stored_at, metrics = entry
+            if time.monotonic() - stored_at < METRICS_CACHE_TTL_SECONDS:
+                self._metrics_cache.move_to_end(mint_address)
                 return metrics
+            del self._metrics_cache[mint_address]
+
+        return await self._metrics_singleflight.do(
+            mint_address, lambda: self._fetch_token_metrics(mint_address)
+        )
+
+    async def _fetch_token_metrics(self, mint_address: str) -> Optional[Dict]:
+        try:
+            # Get data from both APIs at once
+            pumpfun_data, dexscreener_data = await asyncio.gather(
+                self.pumpfun_api.get_token_info(mint_address),
+                self.dexscreener_api.get_token_price(mint_address)
+            )
+
+            metrics = {
+                "mint_address": mint_address,
+                "pumpfun_data": asdict(pumpfun_data) if pumpfun_data else None,
+                "dexscreener_data": asdict(dexscreener_data) if dexscreener_data else None,
+                "last_updated": datetime.now()
+            }
+
+            self._metrics_cache[mint_address] = (time.monotonic(), metrics)
+            if len(self._metrics_cache) > METRICS_CACHE_MAX_SIZE:
+                self._metrics_cache.popitem(last=False)
+            return metrics
 
         except Exception as e:
             logger.error(f"Error getting token metrics: {e}")
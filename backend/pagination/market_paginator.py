@@ -1,22 +1,42 @@
 from fastapi import Query, HTTPException
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from pydantic import BaseModel, Field
+import base64
+import hashlib
 import math
+import warnings
+import numpy as np
+import orjson
+from collections import OrderedDict
 from datetime import datetime
 
-from ..main import Market, RealMarket
-from ..cache.redis_cache import cache_manager
+from main import Market
+from cache.redis_cache import cache_manager
+
+# Number of filtered/sorted orderings kept in-process
+SORTED_INDEX_CACHE_SIZE = 64
+
+# Offset paging past this page is deprecated in favour of cursors
+MAX_OFFSET_PAGE = 10
+
+# Sort key for markets without created_at (a constant so sorting doesn't allocate per element)
+_MIN_DT = datetime.min
+
+# Sort fields that are plain floats on both market types; sorted with a numpy argsort
+NUMERIC_SORT_FIELDS = {"current_market_cap", "yes_price", "no_price", "total_volume"}
 
 class PaginationParams(BaseModel):
     page: int = Field(ge=1, default=1)
     size: int = Field(ge=1, le=100, default=20)
     sort_by: Optional[str] = Field(default="created_at")
-    sort_order: Optional[str] = Field(default="desc", regex="^(asc|desc)$")
-    status: Optional[str] = Field(default=None, regex="^(active|resolved|expired)$")
+    sort_order: Optional[str] = Field(default="desc", pattern="^(asc|desc)$")
+    status: Optional[str] = Field(default=None, pattern="^(active|resolved|expired)$")
     search: Optional[str] = Field(default=None, max_length=100)
+    # Opaque keyset cursor from a previous response's next_cursor; takes precedence over page
+    cursor: Optional[str] = Field(default=None, max_length=512)
 
 class PaginatedResponse(BaseModel):
-    items: List[Dict[str, Any]]
+    items: List[Any]  # JSON-ready market dicts; passed through without per-field validation
     total_count: int
     page: int
     size: int
@@ -25,11 +45,14 @@ class PaginatedResponse(BaseModel):
     has_prev: bool
     next_page: Optional[int] = None
     prev_page: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 class MarketPaginator:
     def __init__(self):
         self.default_size = 20
         self.max_size = 100
+        # (market_type, markets_version, len, status, search, sort_by, sort_order) -> indices into markets
+        self._sorted_index_cache: "OrderedDict[tuple, Tuple[int, ...]]" = OrderedDict()
 
     def validate_pagination_params(self, page: int, size: int, sort_by: str, sort_order: str) -> tuple:
         """Validate and normalize pagination parameters"""
@@ -58,60 +81,90 @@ class MarketPaginator:
         return page, size, sort_by, sort_order
 
     def generate_cache_key(self, params: PaginationParams, market_type: str = "all") -> str:
-        """Generate cache key for paginated results"""
+        """
+        Generate cache key for paginated results.
+        The query parts are hashed to a fixed-width 128-bit blake2b digest so a
+        100-char search term doesn't inflate every key sent to Redis.
+        """
         key_parts = [
-            "paginated_markets",
-            market_type,
             str(params.page),
             str(params.size),
             params.sort_by or "created_at",
             params.sort_order or "desc",
             params.status or "all",
-            params.search or ""
+            params.search or "",
+            params.cursor or ""
         ]
-        return ":".join(key_parts)
+        digest = hashlib.blake2b(":".join(key_parts).encode(), digest_size=16).hexdigest()
+        return f"pm:{market_type}:{digest}"
 
     async def get_paginated_markets(
         self, 
-        markets: List[Union[Market, RealMarket]], 
+        markets: List[Market], 
         params: PaginationParams,
-        market_type: str = "all"
+        market_type: str = "all",
+        markets_version: Optional[int] = None
     ) -> PaginatedResponse:
-        """Get paginated markets with caching"""
+        """
+        Get paginated markets with caching.
+        Pass the caller's markets_version (bumped on every market mutation) to
+        reuse one filtered+sorted ordering across pages; a locally cached
+        ordering is served without a Redis round trip.
+        """
         
         # Validate parameters
         page, size, sort_by, sort_order = self.validate_pagination_params(
             params.page, params.size, params.sort_by, params.sort_order
         )
         
-        # Check cache first
-        cache_key = self.generate_cache_key(params, market_type)
-        cached_result = await cache_manager.get_paginated_markets(cache_key)
-        
-        if cached_result:
-            return PaginatedResponse(**cached_result)
+        index_key = None
+        if markets_version is not None:
+            # market_type too: the cached positions index into whichever list the caller passed
+            index_key = (market_type, markets_version, len(markets), params.status, params.search, sort_by, sort_order)
         
-        # Filter markets
-        filtered_markets = self.filter_markets(markets, params.status, params.search)
+        # Check cache first (the in-process ordering, then Redis)
+        cache_key = self.generate_cache_key(params, market_type)
+        local_hit = index_key is not None and index_key in self._sorted_index_cache
+        if not local_hit:
+            cached_result = await cache_manager.get_paginated_markets(cache_key)
+            
+            if cached_result:
+                return PaginatedResponse(**cached_result)
         
-        # Sort markets
-        sorted_markets = self.sort_markets(filtered_markets, sort_by, sort_order)
+        # Filter and sort markets
+        if index_key is not None:
+            indices = self._sorted_indices(markets, index_key)
+        else:
+            indices = self._compute_sorted_indices(markets, params.status, params.search, sort_by, sort_order)
         
         # Calculate pagination
-        total_count = len(sorted_markets)
+        total_count = len(indices)
         total_pages = math.ceil(total_count / size) if total_count > 0 else 1
         
-        # Adjust page if it's beyond total pages
-        if page > total_pages and total_pages > 0:
-            page = total_pages
+        if params.cursor:
+            # Keyset paging: resume right after the last market of the previous page
+            start_idx = self._cursor_start(markets, indices, sort_by, sort_order, params.cursor)
+            page = start_idx // size + 1
+        else:
+            if page > MAX_OFFSET_PAGE:
+                warnings.warn(
+                    "page-based pagination beyond page %d is deprecated; use cursor" % MAX_OFFSET_PAGE,
+                    DeprecationWarning
+                )
+            
+            # Adjust page if it's beyond total pages
+            if page > total_pages and total_pages > 0:
+                page = total_pages
+            start_idx = (page - 1) * size
         
         # Get slice for current page
-        start_idx = (page - 1) * size
         end_idx = start_idx + size
-        page_items = sorted_markets[start_idx:end_idx]
+        page_items = [markets[i] for i in indices[start_idx:end_idx]]
+        has_next = end_idx < total_count
         
-        # Convert to dict for JSON serialization
-        items = [market.dict() for market in page_items]
+        # Dump straight to JSON-native types (datetimes as ISO strings) in pydantic's Rust core,
+        # so orjson serializes the page in one pass with no default= fallback per value
+        items = [market.model_dump(mode="json") for market in page_items]
         
         # Build response
         response = PaginatedResponse(
@@ -120,28 +173,133 @@ class MarketPaginator:
             page=page,
             size=size,
             total_pages=total_pages,
-            has_next=page < total_pages,
-            has_prev=page > 1,
-            next_page=page + 1 if page < total_pages else None,
-            prev_page=page - 1 if page > 1 else None
+            has_next=has_next,
+            has_prev=start_idx > 0,
+            next_page=page + 1 if has_next else None,
+            prev_page=page - 1 if page > 1 else None,
+            next_cursor=self.encode_cursor(page_items[-1], sort_by) if has_next and page_items else None
         )
         
-        # Cache the result
-        await cache_manager.cache_paginated_markets(
-            cache_key, 
-            items, 
-            total_count, 
-            ttl=60  # 1 minute cache
-        )
+        # Cache the result (a page served from the local ordering skips the Redis write)
+        if not local_hit:
+            await cache_manager.cache_paginated_markets(
+                cache_key, 
+                items, 
+                total_count, 
+                ttl=60  # 1 minute cache
+            )
         
         return response
 
+    def _compute_sorted_indices(
+        self,
+        markets: List[Market],
+        status: Optional[str],
+        search: Optional[str],
+        sort_by: str,
+        sort_order: str
+    ) -> Tuple[int, ...]:
+        """Positions in `markets` of the filtered markets, in sorted order"""
+        position = {id(m): i for i, m in enumerate(markets)}
+        ordered = self.sort_markets(self.filter_markets(markets, status, search), sort_by, sort_order)
+        return tuple(position[id(m)] for m in ordered)
+
+    def _sorted_indices(self, markets: List[Market], index_key: tuple) -> Tuple[int, ...]:
+        """LRU-cached _compute_sorted_indices, keyed by market type, markets_version and the query"""
+        indices = self._sorted_index_cache.get(index_key)
+        if indices is not None:
+            self._sorted_index_cache.move_to_end(index_key)
+            return indices
+        
+        _, _, _, status, search, sort_by, sort_order = index_key
+        indices = self._compute_sorted_indices(markets, status, search, sort_by, sort_order)
+        self._sorted_index_cache[index_key] = indices
+        if len(self._sorted_index_cache) > SORTED_INDEX_CACHE_SIZE:
+            self._sorted_index_cache.popitem(last=False)
+        return indices
+
+    @staticmethod
+    def _cursor_value(market: Market, sort_by: str) -> Any:
+        """A market's sort value as stored in a cursor: JSON-friendly and ordered like sort_markets"""
+        if sort_by in NUMERIC_SORT_FIELDS:
+            return float(getattr(market, sort_by))
+        if sort_by == "token_symbol":
+            return market.token_symbol.lower()
+        value = getattr(market, sort_by, _MIN_DT)
+        return value.isoformat() if isinstance(value, datetime) else value
+
+    def encode_cursor(self, market: Market, sort_by: str) -> str:
+        """Cursor pointing just past `market`: url-safe base64 of [sort value, market id]"""
+        return base64.urlsafe_b64encode(orjson.dumps([self._cursor_value(market, sort_by), market.id])).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Optional[Tuple[Any, str]]:
+        """Inverse of encode_cursor; None for a malformed cursor"""
+        try:
+            value, market_id = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError):
+            return None
+        return value, market_id
+
+    def _cursor_start(
+        self,
+        markets: List[Market],
+        indices: Tuple[int, ...],
+        sort_by: str,
+        sort_order: str,
+        cursor: str
+    ) -> int:
+        """
+        Position in the ordering right after the cursor's market.
+        Binary-searches the sort values for the end of the cursor value's run,
+        then walks back over ties to the cursor's market id. If that market is
+        gone, the page resumes at the start of the tie run (never skipping any).
+        Malformed cursors start from the beginning.
+        """
+        decoded = self.decode_cursor(cursor)
+        if decoded is None:
+            return 0
+        value, last_id = decoded
+        reverse = sort_order == "desc"
+        
+        def key(pos: int) -> Any:
+            return self._cursor_value(markets[indices[pos]], sort_by)
+        
+        try:
+            # First position whose value is strictly past the cursor value in page order
+            lo, hi = 0, len(indices)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                v = key(mid)
+                if (v < value) if reverse else (v > value):
+                    hi = mid
+                else:
+                    lo = mid + 1
+            
+            pos = lo
+            while pos > 0 and key(pos - 1) == value:
+                pos -= 1
+                if markets[indices[pos]].id == last_id:
+                    return pos + 1
+            return pos
+        except TypeError:
+            # Cursor value of the wrong type for this sort field
+            return 0
+
+    @staticmethod
+    def _search_text(market: Market) -> str:
+        """Lowercased symbol + question, precomputed on Market; built on the fly for other types"""
+        blob = getattr(market, "_search_blob", None)
+        if blob:
+            return blob
+        return f"{market.token_symbol.lower()}\x00{market.question.lower()}"
+
     def filter_markets(
         self, 
-        markets: List[Union[Market, RealMarket]], 
+        markets: List[Market], 
         status: Optional[str], 
         search: Optional[str]
-    ) -> List[Union[Market, RealMarket]]:
+    ) -> List[Market]:
         """Filter markets by status and search term"""
         filtered = markets
         
@@ -149,42 +307,35 @@ class MarketPaginator:
         if status:
             filtered = [m for m in filtered if m.status == status]
         
-        # Filter by search term
+        # Filter by search term (one substring check against the precomputed lowercase blob)
         if search:
             search_lower = search.lower()
-            filtered = [
-                m for m in filtered 
-                if search_lower in m.token_symbol.lower() 
-                or search_lower in m.question.lower()
-            ]
+            filtered = [m for m in filtered if search_lower in self._search_text(m)]
         
         return filtered
 
     def sort_markets(
         self, 
-        markets: List[Union[Market, RealMarket]], 
+        markets: List[Market], 
         sort_by: str, 
         sort_order: str
-    ) -> List[Union[Market, RealMarket]]:
+    ) -> List[Market]:
         """Sort markets by specified field"""
         reverse = sort_order == "desc"
         
         try:
-            if sort_by == "created_at":
-                # Handle both Market and RealMarket
+            if sort_by in NUMERIC_SORT_FIELDS:
+                # Pull the key column out once and argsort it in C instead of a Python key per element.
+                # Negating for desc keeps ties in their original order, like sorted(reverse=True).
+                keys = np.fromiter((getattr(m, sort_by) for m in markets), dtype=np.float64, count=len(markets))
+                order = np.argsort(-keys if reverse else keys, kind="stable")
+                return [markets[i] for i in order.tolist()]
+            elif sort_by == "created_at":
                 return sorted(
                     markets, 
-                    key=lambda m: getattr(m, 'created_at', datetime.now()), 
+                    key=lambda m: getattr(m, 'created_at', _MIN_DT), 
                     reverse=reverse
                 )
-            elif sort_by == "current_market_cap":
-                return sorted(markets, key=lambda m: m.current_market_cap, reverse=reverse)
-            elif sort_by == "yes_price":
-                return sorted(markets, key=lambda m: m.yes_price, reverse=reverse)
-            elif sort_by == "no_price":
-                return sorted(markets, key=lambda m: m.no_price, reverse=reverse)
-            elif sort_by == "total_volume":
-                return sorted(markets, key=lambda m: m.total_volume, reverse=reverse)
             elif sort_by == "expiry_time":
                 return sorted(markets, key=lambda m: m.expiry_time, reverse=reverse)
             elif sort_by == "token_symbol":
@@ -193,7 +344,7 @@ class MarketPaginator:
                 # Default sort by created_at
                 return sorted(
                     markets, 
-                    key=lambda m: getattr(m, 'created_at', datetime.now()), 
+                    key=lambda m: getattr(m, 'created_at', _MIN_DT), 
                     reverse=reverse
                 )
         except Exception as e:
@@ -7,7 +7,8 @@ Debug: Provides real-time SOL price for accurate $1 equivalent calculations.
 import asyncio
 import aiohttp
 import logging
-from typing import Optional
+import time
+from typing import Optional, Tuple
 from datetime import datetime
 from dataclasses import dataclass
 
@@ -16,12 +17,18 @@ logger = logging.getLogger(__name__)
 # 1 SOL = 1,000,000,000 lamports
 LAMPORTS_PER_SOL = 1_000_000_000
 
+# Prices are converted to integer micro-dollars so the lamport math is exact integer division
+PRICE_SCALE = 1_000_000
+
 # Cache duration in seconds
 CACHE_DURATION_SECONDS = 30
 
 # Fallback price if all APIs fail (used only as last resort)
 FALLBACK_SOL_PRICE_USD = 130.0
 
+# Per-request timeout for price sources
+REQUEST_TIMEOUT_SECONDS = 5
+
 
 @dataclass
 class SolPriceData:
@@ -42,23 +49,49 @@ class SolPriceOracle:
     
     def __init__(self):
         self._cached_price: Optional[SolPriceData] = None
-        self._cache_timestamp: Optional[datetime] = None
+        # time.monotonic() until which _cached_price is fresh; read without the lock
+        self._cache_deadline: float = 0.0
         self._lock = asyncio.Lock()
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Long-lived session for the price sources, created on first use.
+        Keep-alive connections survive between refreshes instead of paying
+        a TCP+TLS handshake to each source every 30 seconds.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=10, ttl_dns_cache=300, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_SECONDS)
+            )
+        return self._session
+    
+    async def close(self):
+        """Close the HTTP session (called from application shutdown)"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
     
     def _calculate_one_dollar_lamports(self, sol_price_usd: float) -> int:
         """
         Calculate how many lamports equal $1 USD.
-        Formula: lamports_per_dollar = LAMPORTS_PER_SOL / sol_price_usd
+        Formula: lamports_per_dollar = LAMPORTS_PER_SOL / sol_price_usd, done as
+        integer division on the micro-dollar price so the result is deterministic.
+        Computed once per fetched price and stored on SolPriceData.
         
         Example at $130/SOL:
         - 1 SOL = 1,000,000,000 lamports
         - $1 = 1,000,000,000 / 130 = 7,692,307 lamports
         """
-        if sol_price_usd <= 0:
+        price_micros = int(round(sol_price_usd * PRICE_SCALE))
+        if price_micros <= 0:
             logger.error("DEBUG: Invalid SOL price, using fallback")
             sol_price_usd = FALLBACK_SOL_PRICE_USD
+            price_micros = int(round(FALLBACK_SOL_PRICE_USD * PRICE_SCALE))
         
-        one_dollar_lamports = int(LAMPORTS_PER_SOL / sol_price_usd)
+        one_dollar_lamports = (LAMPORTS_PER_SOL * PRICE_SCALE) // price_micros
         
         # Debug: Log calculation
         logger.info(f"DEBUG: SOL=${sol_price_usd:.2f}, $1={one_dollar_lamports:,} lamports")
@@ -69,7 +102,7 @@ class SolPriceOracle:
         """Fetch SOL price from CoinGecko API (free, no API key required)"""
         try:
             url = "https://api.coingecko.com/api/v3/simple/price?ids=solana&vs_currencies=usd"
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
+            async with session.get(url) as response:
                 if response.status == 200:
                     data = await response.json()
                     price = data.get("solana", {}).get("usd")
@@ -85,7 +118,7 @@ class SolPriceOracle:
         try:
             # Jupiter price API for SOL
             url = "https://price.jup.ag/v4/price?ids=SOL"
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
+            async with session.get(url) as response:
                 if response.status == 200:
                     data = await response.json()
                     price = data.get("data", {}).get("SOL", {}).get("price")
@@ -100,7 +133,7 @@ class SolPriceOracle:
         """Fetch SOL price from Binance API"""
         try:
             url = "https://api.binance.com/api/v3/ticker/price?symbol=SOLUSDT"
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
+            async with session.get(url) as response:
                 if response.status == 200:
                     data = await response.json()
                     price = data.get("price")
@@ -111,48 +144,78 @@ class SolPriceOracle:
             logger.warning(f"DEBUG: Binance fetch failed: {e}")
         return None
     
+    async def _first_price(self, session: aiohttp.ClientSession, sources) -> Optional[Tuple[str, float]]:
+        """
+        Query all sources at once and return (source name, price) for the first
+        valid answer, cancelling the rest. Worst case is the slowest timeout
+        rather than the sum of them. Preference order only breaks ties between
+        sources that finish in the same event-loop turn.
+        """
+        tasks = {
+            asyncio.create_task(fetch_func(session)): (priority, source_name)
+            for priority, (source_name, fetch_func) in enumerate(sources)
+        }
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: tasks[t][0]):
+                    price = task.result()
+                    if price and price > 0:
+                        return tasks[task][1], price
+        finally:
+            for task in pending:
+                task.cancel()
+        return None
+    
     async def get_sol_price(self, force_refresh: bool = False) -> SolPriceData:
         """
         Get current SOL price with caching.
-        Tries multiple sources in order of preference.
+        Races the sources and takes the first valid price.
         Debug: Returns cached price if fresh, otherwise fetches new price.
+        A fresh cached price is returned without taking the lock; only misses
+        serialize, and they re-check once they hold it.
         """
+        cached = self._cached_price
+        if not force_refresh and cached and time.monotonic() < self._cache_deadline:
+            return cached
+        
         async with self._lock:
-            now = datetime.now()
+            # Another caller may have refreshed while we waited for the lock
+            if not force_refresh and self._cached_price and time.monotonic() < self._cache_deadline:
+                logger.debug("DEBUG: Using cached SOL price")
+                return self._cached_price
             
-            # Check cache validity
-            if not force_refresh and self._cached_price and self._cache_timestamp:
-                age = (now - self._cache_timestamp).total_seconds()
-                if age < CACHE_DURATION_SECONDS:
-                    logger.debug(f"DEBUG: Using cached SOL price (age: {age:.1f}s)")
-                    return self._cached_price
+            # Wall-clock time is only needed for the timestamp handed to consumers
+            now = datetime.now()
             
             # Fetch fresh price from APIs
-            async with aiohttp.ClientSession() as session:
-                # Try sources in order of preference
-                sources = [
-                    ("Jupiter", self._fetch_from_jupiter),
-                    ("CoinGecko", self._fetch_from_coingecko),
-                    ("Binance", self._fetch_from_binance),
-                ]
+            session = self._get_session()
+            
+            # Sources in order of preference
+            sources = [
+                ("Jupiter", self._fetch_from_jupiter),
+                ("CoinGecko", self._fetch_from_coingecko),
+                ("Binance", self._fetch_from_binance),
+            ]
+            
+            result = await self._first_price(session, sources)
+            if result:
+                source_name, price = result
+                price_data = SolPriceData(
+                    price_usd=price,
+                    one_dollar_lamports=self._calculate_one_dollar_lamports(price),
+                    source=source_name,
+                    timestamp=now,
+                    is_stale=False
+                )
                 
-                for source_name, fetch_func in sources:
-                    price = await fetch_func(session)
-                    if price and price > 0:
-                        price_data = SolPriceData(
-                            price_usd=price,
-                            one_dollar_lamports=self._calculate_one_dollar_lamports(price),
-                            source=source_name,
-                            timestamp=now,
-                            is_stale=False
-                        )
-                        
-                        # Update cache
-                        self._cached_price = price_data
-                        self._cache_timestamp = now
-                        
-                        logger.info(f"DEBUG: SOL price updated from {source_name}: ${price:.2f}")
-                        return price_data
+                # Update cache
+                self._cached_price = price_data
+                self._cache_deadline = time.monotonic() + CACHE_DURATION_SECONDS
+                
+                logger.info(f"DEBUG: SOL price updated from {source_name}: ${price:.2f}")
+                return price_data
             
             # All sources failed - use cached price if available (mark as stale)
             if self._cached_price:
@@ -181,6 +244,7 @@ class SolPriceOracle:
         Debug: Continuously refreshes SOL price in the background.
         """
         logger.info(f"DEBUG: Starting SOL price background refresh (interval: {interval_seconds}s)")
+        self._get_session()
         while True:
             try:
                 await self.get_sol_price(force_refresh=True)
@@ -1,11 +1,13 @@
 import asyncio
-import json
+import heapq
 import logging
-from typing import Dict, List, Set, Any, Optional
-from datetime import datetime, timedelta
-from collections import defaultdict, deque
+from typing import AbstractSet, Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
+from datetime import datetime
 import weakref
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
+
+import numpy as np
+import orjson
 
 from fastapi import WebSocket, WebSocketDisconnect
 from websockets.exceptions import ConnectionClosed
@@ -15,6 +17,86 @@ from ..cache.redis_cache import cache_manager
 
 logger = logging.getLogger(__name__)
 
+# Connections with no activity for this long (loop.time() seconds) are closed by the cleanup task
+INACTIVITY_TIMEOUT_SECONDS = 300.0
+
+# Initial number of connection slots each market subscription bitmap covers (doubled as needed)
+INITIAL_SLOT_CAPACITY = 1024
+
+# Outbound messages buffered per connection before the oldest are dropped
+OUTBOUND_QUEUE_SIZE = 256
+
+# broadcast_bytes: sends in flight at once, and connections per gather before yielding to the loop
+BROADCAST_CONCURRENCY = 256
+BROADCAST_CHUNK_SIZE = 512
+
+# Broadcast payloads with at least this many entries (top level plus one level down) are serialized in a worker thread
+OFFLOAD_ENCODE_ENTRIES = 50
+
+_PRICE_UPDATE_PREFIX = b'{"type":"price_update","data":'
+
+
+def _compile_encoder(model: type) -> Callable[[Any], bytes]:
+    """
+    Generate, once, an encoder specialised to a model's fixed field list: a
+    dict literal read by attribute and a single orjson call, the same shape
+    as model_dump() without pydantic's generic serializer walk. Built from
+    model_fields so it follows the model when fields are added.
+    """
+    fields = list(model.model_fields)
+    body = ", ".join(f"{name!r}: obj.{name}" for name in fields)
+    source = f"def encode(obj):\n    return dumps({{{body}}})\n"
+    namespace = {"dumps": orjson.dumps}
+    exec(compile(source, f"<{model.__name__} encoder>", "exec"), namespace)
+    encode = namespace["encode"]
+    encode.__doc__ = f"JSON for a {model.__name__}'s fields: {', '.join(fields)}"
+    return encode
+
+
+_encode_price_update = _compile_encoder(PriceUpdate)
+
+
+async def _encode_message(message: Union[bytes, str, Dict[str, Any], List[Any]]) -> bytes:
+    """
+    JSON-encode a broadcast payload. bytes pass through untouched and a str is
+    taken as already-serialized JSON (the manager's original message type).
+    Large aggregated payloads are serialized off the event loop; small ones
+    aren't worth the thread hop, which costs more than encoding them inline.
+    """
+    if isinstance(message, bytes):
+        return message
+    if isinstance(message, str):
+        return message.encode()
+    # Count one level down: the usual large payload is an envelope like {"type": ..., "data": [...]}
+    entries = len(message)
+    for value in (message.values() if isinstance(message, dict) else message):
+        if isinstance(value, (list, dict)):
+            entries += len(value)
+            if entries >= OFFLOAD_ENCODE_ENTRIES:
+                break
+    if entries >= OFFLOAD_ENCODE_ENTRIES:
+        return await asyncio.to_thread(orjson.dumps, message)
+    return orjson.dumps(message)
+
+class _Stats:
+    """Manager counters as slot attributes: bumped on every send, so cheaper than dict keys"""
+    __slots__ = (
+        "total_connections", "active_connections", "messages_sent", "messages_queued",
+        "messages_dropped", "errors", "last_cleanup"
+    )
+
+    def __init__(self):
+        self.total_connections = 0
+        self.active_connections = 0
+        self.messages_sent = 0
+        self.messages_queued = 0
+        self.messages_dropped = 0  # oldest messages evicted from full outbound queues
+        self.errors = 0
+        self.last_cleanup = datetime.now()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
 @dataclass
 class WebSocketMessage:
     type: str
@@ -28,43 +110,49 @@ class OptimizedConnectionManager:
         self.connections: Dict[str, WebSocket] = {}
         self.connection_metadata: Dict[str, Dict[str, Any]] = {}
         
+        # Each connection holds a dense integer slot while connected (freed slots are reused).
+        # String ids are resolved once at the public API boundary; hot paths index these lists by slot.
+        self._slot_of: Dict[str, int] = {}
+        self.slot_to_connection: List[Optional[str]] = []
+        self._ws_by_slot: List[Optional[WebSocket]] = []
+        self._md_by_slot: List[Optional[Dict[str, Any]]] = []
+        self._free_slots: List[int] = []
+        self._slot_capacity = INITIAL_SLOT_CAPACITY
+        
         # Subscription management
-        self.market_subscriptions: Dict[str, Set[str]] = defaultdict(set)  # market_id -> connection_ids
-        self.connection_subscriptions: Dict[str, Set[str]] = defaultdict(set)  # connection_id -> market_ids
+        self.market_subscriptions: Dict[str, np.ndarray] = {}  # market_id -> bool bitmap indexed by slot
+        self.connection_subscriptions: Dict[str, Set[str]] = {}  # connection_id -> market_ids
+        # Immutable tuple of each market's subscriber slots, republished on (un)subscribe; broadcasts read it without copying
+        self.market_snapshots: Dict[str, tuple] = {}
         
-        # Message batching and rate limiting
-        self.message_queue: deque = deque()
-        self.batch_size = 100
-        self.batch_interval = 0.1  # 100ms
-        self.rate_limits: Dict[str, deque] = defaultdict(deque)  # connection_id -> timestamps
-        self.max_messages_per_second = 10
+        # Rate limiting (outbound queues and writer tasks live in connection_metadata)
+        # Token bucket per connection, kept in its metadata as 'tokens' / 'last_refill' (loop.time())
+        # and refilled lazily on each send
+        self.max_messages_per_second = 10  # refill rate and burst capacity
         
         # Performance monitoring
-        self.stats = {
-            'total_connections': 0,
-            'active_connections': 0,
-            'messages_sent': 0,
-            'messages_queued': 0,
-            'errors': 0,
-            'last_cleanup': datetime.now()
-        }
+        self.stats = _Stats()
+        
+        # Min-heap of (activity time, connection_id) for the cleanup task: one live entry per
+        # connection, whose time is mirrored in metadata['activity_heap_ts']. Activity updates
+        # don't touch the heap; an entry found expired is re-pushed with the real last_activity.
+        self._activity_heap: List[Tuple[float, str]] = []
+        
+        # Event loop, captured on first connect; its time() is the clock for hot-path timestamps
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
         
         # Background tasks
-        self.batch_task: Optional[asyncio.Task] = None
         self.cleanup_task: Optional[asyncio.Task] = None
         
         # Start background processors
         self.start_background_processors()
 
     def start_background_processors(self):
-        """Start background tasks for message processing and cleanup"""
-        self.batch_task = asyncio.create_task(self.message_batch_processor())
+        """Start background tasks for connection cleanup"""
         self.cleanup_task = asyncio.create_task(self.connection_cleanup())
 
     async def stop_background_processors(self):
         """Stop background tasks"""
-        if self.batch_task:
-            self.batch_task.cancel()
         if self.cleanup_task:
             self.cleanup_task.cancel()
 
@@ -72,32 +160,50 @@ class OptimizedConnectionManager:
         """Connect a new WebSocket with optimized handling"""
         try:
             await websocket.accept()
+            if self._loop is None:
+                self._loop = asyncio.get_running_loop()
+            # Reusing a live id replaces that connection (stopping its writer) rather than orphaning it
+            if connection_id in self.connections:
+                await self.disconnect(connection_id)
+            now = self._loop.time()
             
-            # Store connection with metadata
+            # Store connection with metadata; one long-lived writer drains its outbound queue
+            queue: asyncio.Queue = asyncio.Queue(maxsize=OUTBOUND_QUEUE_SIZE)
+            market_updates: Dict[str, bytes] = {}
             self.connections[connection_id] = websocket
-            self.connection_metadata[connection_id] = {
+            metadata = self.connection_metadata[connection_id] = {
+                'queue': queue,
+                # Latest unsent update per market (see queue_market_update)
+                'market_updates': market_updates,
                 'connected_at': datetime.now(),
-                'last_activity': datetime.now(),
+                # Activity/send times are loop.time() floats, not datetimes
+                'last_activity': now,
+                'activity_heap_ts': now,
+                'tokens': float(self.max_messages_per_second),
+                'last_refill': now,
                 'ip_address': websocket.client.host if websocket.client else 'unknown',
                 'user_agent': websocket.headers.get('user-agent', 'unknown'),
-                'subscribed_markets': set(),
                 'message_count': 0,
                 'last_message_sent': None
             }
+            slot = metadata['slot'] = self._assign_slot(connection_id, websocket, metadata)
+            metadata['writer'] = asyncio.create_task(self._writer_loop(connection_id, slot, metadata))
             
             # Update stats
-            self.stats['total_connections'] += 1
-            self.stats['active_connections'] = len(self.connections)
+            heapq.heappush(self._activity_heap, (now, connection_id))
+            
+            self.stats.total_connections += 1
+            self.stats.active_connections = len(self.connections)
             
-            # Cache connection count
-            await cache_manager.cache_websocket_connections(self.stats['active_connections'])
+            # Count the connection in the shared (cross-worker) counter
+            await cache_manager.ws_connect()
             
-            logger.info(f"WebSocket connected: {connection_id} (total: {self.stats['active_connections']})")
+            logger.info(f"WebSocket connected: {connection_id} (total: {self.stats.active_connections})")
             return True
             
         except Exception as e:
             logger.error(f"Error connecting WebSocket {connection_id}: {e}")
-            self.stats['errors'] += 1
+            self.stats.errors += 1
             return False
 
     async def disconnect(self, connection_id: str):
@@ -107,76 +213,143 @@ class OptimizedConnectionManager:
                 # Remove from all subscriptions
                 await self.unsubscribe_from_all(connection_id)
                 
-                # Remove connection
+                # Remove connection and stop its writer (unless the writer is the one disconnecting)
                 del self.connections[connection_id]
-                del self.connection_metadata[connection_id]
-                del self.rate_limits[connection_id]
+                self._release_slot(connection_id)
+                writer = self.connection_metadata.pop(connection_id)['writer']
+                if writer is not asyncio.current_task():
+                    writer.cancel()
                 
                 # Update stats
-                self.stats['active_connections'] = len(self.connections)
+                self.stats.active_connections = len(self.connections)
                 
-                # Cache connection count
-                await cache_manager.cache_websocket_connections(self.stats['active_connections'])
+                # Count the disconnect in the shared (cross-worker) counter
+                await cache_manager.ws_disconnect()
                 
-                logger.info(f"WebSocket disconnected: {connection_id} (total: {self.stats['active_connections']})")
+                logger.info(f"WebSocket disconnected: {connection_id} (total: {self.stats.active_connections})")
                 
             except Exception as e:
                 logger.error(f"Error disconnecting WebSocket {connection_id}: {e}")
-                self.stats['errors'] += 1
+                self.stats.errors += 1
+
+    def _assign_slot(self, connection_id: str, websocket: WebSocket, metadata: Dict[str, Any]) -> int:
+        """Give a connection a slot (growing every market bitmap if slots run out) and fill its entries"""
+        slot = self._slot_of.get(connection_id)
+        if slot is None:
+            if self._free_slots:
+                slot = self._free_slots.pop()
+            else:
+                slot = len(self.slot_to_connection)
+                self.slot_to_connection.append(None)
+                self._ws_by_slot.append(None)
+                self._md_by_slot.append(None)
+            self._slot_of[connection_id] = slot
+            
+            if slot >= self._slot_capacity:
+                self._slot_capacity *= 2
+                for market_id, bitmap in self.market_subscriptions.items():
+                    grown = np.zeros(self._slot_capacity, dtype=bool)
+                    grown[:len(bitmap)] = bitmap
+                    self.market_subscriptions[market_id] = grown
+        
+        self.slot_to_connection[slot] = connection_id
+        self._ws_by_slot[slot] = websocket
+        self._md_by_slot[slot] = metadata
+        return slot
+
+    def _release_slot(self, connection_id: str):
+        """Return a disconnected connection's slot to the free list (its bits are already cleared)"""
+        slot = self._slot_of.pop(connection_id, None)
+        if slot is not None:
+            self.slot_to_connection[slot] = None
+            self._ws_by_slot[slot] = None
+            self._md_by_slot[slot] = None
+            self._free_slots.append(slot)
+
+    def _publish_snapshot(self, market_id: str, bitmap: np.ndarray):
+        """Rebuild the market's subscriber slot tuple from its bitmap (set bits found in C)"""
+        self.market_snapshots[market_id] = tuple(np.flatnonzero(bitmap).tolist())
 
     async def subscribe_to_market(self, connection_id: str, market_id: str):
         """Subscribe a connection to market updates"""
         if connection_id in self.connections and market_id:
-            self.market_subscriptions[market_id].add(connection_id)
-            self.connection_subscriptions[connection_id].add(market_id)
-            
-            # Update metadata
-            if connection_id in self.connection_metadata:
-                self.connection_metadata[connection_id]['subscribed_markets'].add(market_id)
-                self.connection_metadata[connection_id]['last_activity'] = datetime.now()
+            slot = self._slot_of[connection_id]
+            bitmap = self.market_subscriptions.get(market_id)
+            if bitmap is None:
+                bitmap = self.market_subscriptions[market_id] = np.zeros(self._slot_capacity, dtype=bool)
+            if not bitmap[slot]:
+                bitmap[slot] = True
+                self._publish_snapshot(market_id, bitmap)
+            self.connection_subscriptions.setdefault(connection_id, set()).add(market_id)
+            self._md_by_slot[slot]['last_activity'] = self._loop.time()
 
     async def unsubscribe_from_market(self, connection_id: str, market_id: str):
         """Unsubscribe a connection from market updates"""
         if connection_id in self.connections:
-            self.market_subscriptions[market_id].discard(connection_id)
-            self.connection_subscriptions[connection_id].discard(market_id)
-            
-            # Clean up empty subscription sets
-            if not self.market_subscriptions[market_id]:
-                del self.market_subscriptions[market_id]
-            
-            # Update metadata
-            if connection_id in self.connection_metadata:
-                self.connection_metadata[connection_id]['subscribed_markets'].discard(market_id)
-                self.connection_metadata[connection_id]['last_activity'] = datetime.now()
+            slot = self._slot_of[connection_id]
+            bitmap = self.market_subscriptions.get(market_id)
+            if bitmap is not None and bitmap[slot]:
+                bitmap[slot] = False
+                # Clean up empty subscription bitmaps
+                if not bitmap.any():
+                    del self.market_subscriptions[market_id]
+                    self.market_snapshots.pop(market_id, None)
+                else:
+                    self._publish_snapshot(market_id, bitmap)
+            markets = self.connection_subscriptions.get(connection_id)
+            if markets is not None:
+                markets.discard(market_id)
+            self._md_by_slot[slot]['last_activity'] = self._loop.time()
 
     async def unsubscribe_from_all(self, connection_id: str):
         """Unsubscribe connection from all markets"""
-        if connection_id in self.connection_subscriptions:
-            for market_id in self.connection_subscriptions[connection_id].copy():
+        markets = self.connection_subscriptions.get(connection_id)
+        if markets:
+            for market_id in tuple(markets):
                 await self.unsubscribe_from_market(connection_id, market_id)
+        self.connection_subscriptions.pop(connection_id, None)
+
+    def subscribed_markets(self, connection_id: str) -> AbstractSet[str]:
+        """Markets a connection is subscribed to (connection_subscriptions is the only record of them)"""
+        return self.connection_subscriptions.get(connection_id, frozenset())
+
+    async def send_personal_message(self, message: Union[bytes, str], connection_id: str) -> bool:
+        """
+        Send a message to a specific connection with rate limiting.
+        Messages are UTF-8 JSON bytes sent as binary frames, so a payload
+        encoded once is shared by every recipient without re-encoding
+        (a JSON str is encoded to bytes first).
+        """
+        if isinstance(message, str):
+            message = message.encode()
+        slot = self._slot_of.get(connection_id)
+        if slot is None:
+            return False
+        return await self._send_to_slot(slot, message)
 
-    async def send_personal_message(self, message: str, connection_id: str) -> bool:
-        """Send a message to a specific connection with rate limiting"""
-        if connection_id not in self.connections:
+    async def _send_to_slot(self, slot: int, message: bytes, rate_limited: bool = True) -> bool:
+        """send_personal_message by slot; rate_limited=False is for callers that already took a token"""
+        metadata = self._md_by_slot[slot]
+        if metadata is None:
             return False
+        # Resolved before any await: the slot may be reassigned once this connection goes away
+        connection_id = self.slot_to_connection[slot]
+        websocket = self._ws_by_slot[slot]
         
-        # Check rate limit
-        if not await self.check_rate_limit(connection_id):
+        if rate_limited and self._take_token(metadata):
             logger.warning(f"Rate limit exceeded for connection {connection_id}")
             return False
         
         try:
-            websocket = self.connections[connection_id]
-            await websocket.send_text(message)
+            await websocket.send({"type": "websocket.send", "bytes": message})
             
             # Update metadata
-            if connection_id in self.connection_metadata:
-                self.connection_metadata[connection_id]['message_count'] += 1
-                self.connection_metadata[connection_id]['last_message_sent'] = datetime.now()
-                self.connection_metadata[connection_id]['last_activity'] = datetime.now()
+            now = self._loop.time()
+            metadata['message_count'] += 1
+            metadata['last_message_sent'] = now
+            metadata['last_activity'] = now
             
-            self.stats['messages_sent'] += 1
+            self.stats.messages_sent += 1
             return True
             
         except (WebSocketDisconnect, ConnectionClosed, RuntimeError) as e:
@@ -185,164 +358,261 @@ class OptimizedConnectionManager:
             return False
         except Exception as e:
             logger.error(f"Error sending message to {connection_id}: {e}")
-            self.stats['errors'] += 1
+            self.stats.errors += 1
             return False
 
-    async def broadcast_to_market(self, market_id: str, message: str):
-        """Broadcast message to all connections subscribed to a market"""
-        if market_id not in self.market_subscriptions:
-            return
+    async def broadcast_to_market(self, market_id: str, message: Union[bytes, str, Dict[str, Any], List[Any]]):
+        """Broadcast message (JSON bytes or str, or an object to encode once) to all connections subscribed to a market"""
+        message = await _encode_message(message)
+        # Queue on each connection's outbound queue (the snapshot is safe to iterate as-is)
+        for slot in self.market_snapshots.get(market_id, ()):
+            self._queue_to_slot(slot, message)
+
+    async def broadcast_to_all(self, message: Union[bytes, str, Dict[str, Any], List[Any]]):
+        """Broadcast message (JSON bytes or str, or an object to encode once) to all active connections"""
+        message = await _encode_message(message)
+        await self.broadcast_bytes(tuple(self._slot_of.values()), message)
+
+    async def broadcast_bytes(self, slots: Sequence[int], payload: bytes):
+        """
+        Send one payload straight to the connections in the given slots (e.g. a
+        market_snapshots tuple), bypassing their queues and rate limits.
+        All sends share a single prebuilt ASGI message, at most
+        BROADCAST_CONCURRENCY in flight, gathered BROADCAST_CHUNK_SIZE at a
+        time with a yield to the event loop in between so a large fan-out
+        doesn't starve other work. Connections whose send fails are
+        disconnected afterwards.
+        """
+        # Resolved before the first await: a slot released mid-broadcast may be
+        # reassigned to a connection that never asked for this payload
+        ws_by_slot = self._ws_by_slot
+        names = self.slot_to_connection
+        targets = [(ws_by_slot[slot], names[slot]) for slot in slots if ws_by_slot[slot] is not None]
+        asgi_message = {"type": "websocket.send", "bytes": payload}
+        semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+        dead = []
         
-        # Get all subscribed connections
-        connection_ids = self.market_subscriptions[market_id].copy()
+        async def send(websocket: WebSocket, connection_id: str):
+            async with semaphore:
+                try:
+                    await websocket.send(asgi_message)
+                    self.stats.messages_sent += 1
+                except (WebSocketDisconnect, ConnectionClosed, RuntimeError):
+                    dead.append((websocket, connection_id))
+                except Exception as e:
+                    logger.error(f"Error broadcasting to {connection_id}: {e}")
+                    self.stats.errors += 1
         
-        # Queue for batch processing
-        for connection_id in connection_ids:
-            await self.queue_message(connection_id, message)
-
-    async def broadcast_to_all(self, message: str):
-        """Broadcast message to all active connections"""
-        connection_ids = list(self.connections.keys())
+        for i in range(0, len(targets), BROADCAST_CHUNK_SIZE):
+            if i:
+                await asyncio.sleep(0)
+            await asyncio.gather(*(send(ws, cid) for ws, cid in targets[i:i + BROADCAST_CHUNK_SIZE]))
         
-        # Queue for batch processing
-        for connection_id in connection_ids:
-            await self.queue_message(connection_id, message)
-
-    async def queue_message(self, connection_id: str, message: str):
-        """Queue a message for batch processing"""
-        self.message_queue.append({
-            'connection_id': connection_id,
-            'message': message,
-            'timestamp': datetime.now()
-        })
-        self.stats['messages_queued'] += 1
-
-    async def message_batch_processor(self):
-        """Background task to process messages in batches"""
-        while True:
-            try:
-                await asyncio.sleep(self.batch_interval)
-                
-                if not self.message_queue:
-                    continue
-                
-                # Process batch
-                batch = []
-                while self.message_queue and len(batch) < self.batch_size:
-                    batch.append(self.message_queue.popleft())
-                
-                if batch:
-                    await self.process_message_batch(batch)
-                    
-            except asyncio.CancelledError:
+        for websocket, connection_id in dead:
+            # Skip ids that have since been reused by a new connection
+            if self.connections.get(connection_id) is websocket:
+                await self.disconnect(connection_id)
+
+    async def queue_message(self, connection_id: str, message: Union[bytes, str]):
+        """Put a message on the connection's outbound queue, dropping its oldest message when full"""
+        if isinstance(message, str):
+            message = message.encode()
+        slot = self._slot_of.get(connection_id)
+        if slot is not None:
+            self._queue_to_slot(slot, message)
+
+    def _queue_to_slot(self, slot: int, message: Optional[bytes]):
+        """queue_message by slot"""
+        metadata = self._md_by_slot[slot]
+        if metadata is None:
+            return
+        queue = metadata['queue']
+        if queue.full():
+            queue.get_nowait()
+            self.stats.messages_dropped += 1
+        queue.put_nowait(message)
+        self.stats.messages_queued += 1
+
+    def queue_market_update(self, connection_id: str, market_id: str, message: bytes):
+        """
+        Latest-wins queueing for per-market updates: an update that hasn't been
+        sent yet is overwritten by the next one for the same market, so stale
+        updates are dropped without ever being queued.
+        """
+        slot = self._slot_of.get(connection_id)
+        if slot is not None:
+            self._queue_market_update_to_slot(slot, market_id, message)
+
+    def _queue_market_update_to_slot(self, slot: int, market_id: str, message: bytes):
+        """queue_market_update by slot"""
+        metadata = self._md_by_slot[slot]
+        if metadata is None:
+            return
+        market_updates = metadata['market_updates']
+        if not market_updates:
+            # Wake the writer; the payloads themselves stay in market_updates.
+            # A full queue needs no wake-up, the writer has work already.
+            queue = metadata['queue']
+            if not queue.full():
+                queue.put_nowait(None)
+        market_updates[market_id] = message
+        self.stats.messages_queued += 1
+
+    async def _writer_loop(self, connection_id: str, slot: int, metadata: Dict[str, Any]):
+        """
+        Long-lived sender for one connection (started in connect, cancelled in
+        disconnect). Messages that piled up while the previous send was in
+        flight or the rate limit was waited out, plus the latest update of
+        each market, go out together as one frame holding a JSON array of
+        them, so clients must accept either a single message object or an array.
+        """
+        queue: asyncio.Queue = metadata['queue']
+        market_updates: Dict[str, bytes] = metadata['market_updates']
+        connection_metadata = self.connection_metadata
+        # Runs only while this connection's own metadata is registered: after a
+        # disconnect the id (and the slot) may already belong to a new connection.
+        # Re-checked after every await.
+        while connection_metadata.get(connection_id) is metadata:
+            # Never block while market updates are waiting (their wake-up may have been dropped)
+            pending = [await queue.get()] if not market_updates else []
+            # Wait for a send token before draining: nothing is dropped for the
+            # rate limit, and updates arriving meanwhile join this frame
+            delay = self._take_token(metadata)
+            while delay and connection_metadata.get(connection_id) is metadata:
+                await asyncio.sleep(delay)
+                delay = self._take_token(metadata)
+            if connection_metadata.get(connection_id) is not metadata:
                 break
+            while not queue.empty():
+                pending.append(queue.get_nowait())
+            # None entries are just wake-ups from queue_market_update
+            pending = [message for message in pending if message is not None]
+            if market_updates:
+                pending.extend(market_updates.values())
+                market_updates.clear()
+            if not pending:
+                # Only stale wake-ups; give the token back
+                metadata['tokens'] += 1.0
+                continue
+            
+            # Messages are already JSON; splice them into an array without re-encoding
+            message = pending[0] if len(pending) == 1 else b"[" + b",".join(pending) + b"]"
+            try:
+                # A failed send disconnects this connection; the loop condition then ends the writer
+                await self._send_to_slot(slot, message, rate_limited=False)
             except Exception as e:
-                logger.error(f"Error in message batch processor: {e}")
-                self.stats['errors'] += 1
-
-    async def process_message_batch(self, batch: List[Dict[str, Any]]):
-        """Process a batch of messages efficiently"""
-        # Group by connection for efficient sending
-        messages_by_connection = defaultdict(list)
-        for item in batch:
-            messages_by_connection[item['connection_id']].append(item['message'])
-        
-        # Send messages concurrently
-        tasks = []
-        for connection_id, messages in messages_by_connection.items():
-            if connection_id in self.connections:
-                # Send only the latest message for each connection to avoid spam
-                latest_message = messages[-1]
-                task = asyncio.create_task(
-                    self.send_personal_message(latest_message, connection_id)
-                )
-                tasks.append(task)
-        
-        # Wait for all sends to complete
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
+                logger.error(f"Error in writer for {connection_id}: {e}")
+                self.stats.errors += 1
 
     async def check_rate_limit(self, connection_id: str) -> bool:
-        """Check if connection is within rate limits"""
-        now = datetime.now()
-        rate_limit_queue = self.rate_limits[connection_id]
-        
-        # Remove old entries (older than 1 second)
-        cutoff = now - timedelta(seconds=1)
-        while rate_limit_queue and rate_limit_queue[0] < cutoff:
-            rate_limit_queue.popleft()
+        """Check if connection is within rate limits (token bucket, O(1) per check)"""
+        metadata = self.connection_metadata.get(connection_id)
+        if metadata is None:
+            return False
+        return not self._take_token(metadata)
+
+    def _take_token(self, metadata: Dict[str, Any]) -> float:
+        """
+        Take a token from the connection's bucket and return 0.0, or return
+        the seconds until one is available (nothing is taken then)
+        """
+        # Refill for the time elapsed since the last check, capped at the burst capacity
+        now = self._loop.time()
+        rate = self.max_messages_per_second
+        tokens = min(float(rate), metadata['tokens'] + (now - metadata['last_refill']) * rate)
+        metadata['last_refill'] = now
         
-        # Check if under limit
-        if len(rate_limit_queue) < self.max_messages_per_second:
-            rate_limit_queue.append(now)
-            return True
+        if tokens >= 1.0:
+            metadata['tokens'] = tokens - 1.0
+            return 0.0
         
-        return False
+        metadata['tokens'] = tokens
+        return (1.0 - tokens) / rate
 
     async def connection_cleanup(self):
-        """Background task to clean up dead connections"""
+        """
+        Background task to clean up dead connections.
+        Only heap entries older than the cutoff are visited, so a pass costs
+        O(k log N) for k candidates instead of a walk over every connection.
+        """
+        heap = self._activity_heap
         while True:
             try:
                 await asyncio.sleep(30)  # Check every 30 seconds
                 
-                now = datetime.now()
+                # Remove connections inactive for more than 5 minutes
+                cutoff = asyncio.get_running_loop().time() - INACTIVITY_TIMEOUT_SECONDS
                 dead_connections = []
                 
-                # Check for inactive connections
-                for connection_id, metadata in self.connection_metadata.items():
+                while heap and heap[0][0] < cutoff:
+                    ts, connection_id = heapq.heappop(heap)
+                    metadata = self.connection_metadata.get(connection_id)
+                    if metadata is None or metadata['activity_heap_ts'] != ts:
+                        # Disconnected, or an entry left over from an earlier connection with this id
+                        continue
                     last_activity = metadata['last_activity']
-                    
-                    # Remove connections inactive for more than 5 minutes
-                    if now - last_activity > timedelta(minutes=5):
+                    if last_activity < cutoff:
                         dead_connections.append(connection_id)
+                    else:
+                        # Active since this entry was pushed; track it at its real activity time
+                        metadata['activity_heap_ts'] = last_activity
+                        heapq.heappush(heap, (last_activity, connection_id))
                 
                 # Clean up dead connections
                 for connection_id in dead_connections:
                     logger.info(f"Cleaning up inactive connection: {connection_id}")
                     await self.disconnect(connection_id)
                 
-                self.stats['last_cleanup'] = now
+                self.stats.last_cleanup = datetime.now()
                 
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f"Error in connection cleanup: {e}")
-                self.stats['errors'] += 1
+                self.stats.errors += 1
 
     async def broadcast_price_update(self, price_update: PriceUpdate):
-        """Optimized price update broadcasting"""
-        message = json.dumps({
-            "type": "price_update",
-            "data": asdict(price_update)
-        })
+        """
+        Optimized price update broadcasting.
+        The update is encoded once; the same bytes go to every subscriber
+        (inside the message envelope) and to the Redis cache.
+        """
+        data = _encode_price_update(price_update)
+        message = _PRICE_UPDATE_PREFIX + data + b"}"
         
-        # Broadcast to market subscribers
-        await self.broadcast_to_market(price_update.market_id, message)
+        # Latest-wins delivery to market subscribers
+        market_id = price_update.market_id
+        for slot in self.market_snapshots.get(market_id, ()):
+            self._queue_market_update_to_slot(slot, market_id, message)
         
         # Cache the price update
-        await cache_manager.cache_price_update(price_update)
+        await cache_manager.cache_price_update(price_update, serialized=data)
 
     async def get_connection_stats(self) -> Dict[str, Any]:
         """Get detailed connection statistics"""
         active_connections = len(self.connections)
-        total_subscriptions = sum(len(subs) for subs in self.market_subscriptions.values())
+        total_subscriptions = sum(len(subs) for subs in self.market_snapshots.values())
+        queue_size = sum(
+            metadata['queue'].qsize() + len(metadata['market_updates'])
+            for metadata in self.connection_metadata.values()
+        )
         
         return {
-            **self.stats,
+            **self.stats.as_dict(),
             'active_connections': active_connections,
             'total_subscriptions': total_subscriptions,
             'average_subscriptions_per_connection': total_subscriptions / active_connections if active_connections > 0 else 0,
-            'queue_size': len(self.message_queue),
-            'memory_usage': len(self.connections) + len(self.market_subscriptions) + len(self.message_queue)
+            'queue_size': queue_size,
+            'memory_usage': len(self.connections) + len(self.market_subscriptions) + queue_size
         }
 
     async def get_market_stats(self) -> Dict[str, Any]:
         """Get market subscription statistics"""
         market_stats = {}
-        for market_id, subscribers in self.market_subscriptions.items():
+        for market_id, subscribers in self.market_snapshots.items():
             market_stats[market_id] = {
                 'subscriber_count': len(subscribers),
-                'subscriber_ids': list(subscribers)
+                'subscriber_ids': [self.slot_to_connection[slot] for slot in subscribers]
             }
         
         return market_stats